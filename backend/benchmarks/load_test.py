@@ -0,0 +1,414 @@
+"""
+Offline load test for the auth and profile API.
+
+Runs src.main in process, with no server, browser or live database. It uses
+an in-memory Beanie-compatible MongoDB (mongomock-motor, pip install
+mongomock-motor) or, with --mongo-url, a local mongod and a throwaway
+database that is dropped at the end. Requests go straight to the ASGI app
+from an async load generator, in three phases:
+
+- signup: a burst of --users concurrent signups;
+- login: a login storm, every user logging in at once;
+- mixed: --concurrency virtual users for --duration seconds, each picking
+  profile reads, token refreshes, logins, signups and photo uploads by
+  the --mix weights.
+
+For each phase and endpoint it reports requests, status codes, throughput and
+latency p50/p90/p99/max, plus event-loop lag. A monitor task measures the lag
+every --lag-interval-ms as how late its sleep wakes up, and each sample is
+credited to every endpoint that had requests in flight during that interval.
+
+    cd backend && python -m benchmarks.load_test --users 200 --duration 10
+    cd backend && python -m benchmarks.load_test --mongo-url mongodb://localhost:27017 --output load.json
+
+The generator shares the event loop with the app, as a worker's own clients
+would not, so the figures include a few microseconds of client work per
+request. Every request comes from its own client address, so the per-IP rate
+limits cost what they cost without tripping. Photos are stored in a temporary
+directory.
+
+Requests the app sheds on purpose (429 from the rate limits, 503 from a full
+password-hashing pool) are reported as shed. Exits with status 1 if any
+request raised or got any other non-2xx status.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Enough configuration to import the app without a backend/.env
+load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
+for _name, _value in {
+    "MONGO_URL": "mongodb://localhost:27017", "MONGO_DB_NAME": "healthapp",
+    "JWT_ACCESS_SECRET": "load-test-access", "JWT_REFRESH_SECRET": "load-test-refresh",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "15", "REFRESH_TOKEN_EXPIRE_DAYS": "7",
+    "ALLOWED_ORIGINS": "http://localhost",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import motor.motor_asyncio  # noqa: E402
+from beanie import init_beanie  # noqa: E402
+
+import src.main as service  # noqa: E402
+from src.models import Prediction, User  # noqa: E402
+from src.photos import PhotoStore  # noqa: E402
+
+ENDPOINTS = ["signup", "login", "refresh", "profile", "photo"]
+DEFAULT_MIX = "profile=60,refresh=20,login=10,signup=5,photo=5"
+PASSWORD = "LoadTest123"
+MULTIPART_BOUNDARY = "load-test-boundary"
+PHOTO_POOL_SIZE = 16
+# Load shedding by design: rate limits and the full password-hashing pool
+SHED_STATUSES = {429, 503}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name.strip()!r} (choose from {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def make_photos(n: int) -> list:
+    """n distinct small PNGs, so uploads are not all deduplicated into one file."""
+    try:
+        from PIL import Image
+    except ImportError:
+        # A valid 1x1 PNG; without Pillow the app stores originals only
+        pixel = bytes.fromhex(
+            "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+            "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+        )
+        return [pixel] * n
+    rng = np.random.default_rng(0)
+    photos = []
+    for _ in range(n):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8)).save(buffer, "PNG")
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def multipart_body(photo: bytes) -> bytes:
+    return (
+        f"--{MULTIPART_BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="avatar.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + photo + f"\r\n--{MULTIPART_BOUNDARY}--\r\n".encode()
+
+
+def summarize_ms(samples) -> dict:
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+class LoadRecorder:
+    """Latencies, statuses and event-loop lag per endpoint for one phase."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.lag = defaultdict(list)
+        self.in_flight = Counter()
+        self.active = set()  # Endpoints with requests in flight since the last lag sample
+        self.errors = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            statuses = self.statuses[endpoint]
+            count = sum(statuses.values()) + self.errors[endpoint]
+            if not count:
+                continue
+            endpoints[endpoint] = {
+                "requests": count,
+                "throughput": count / elapsed,
+                "statuses": {str(code): n for code, n in sorted(statuses.items())},
+                "shed": sum(n for code, n in statuses.items() if code in SHED_STATUSES),
+                "failed": self.errors[endpoint] + sum(
+                    n for code, n in statuses.items() if not 200 <= code < 300 and code not in SHED_STATUSES
+                ),
+                "errors": self.errors[endpoint],
+                "latency": summarize_ms(self.latencies[endpoint]),
+                "loop_lag": summarize_ms(self.lag[endpoint]),
+            }
+        total = sum(endpoint["requests"] for endpoint in endpoints.values())
+        return {
+            "seconds": elapsed,
+            "requests": total,
+            "throughput": total / elapsed if elapsed else 0.0,
+            "loop_lag": summarize_ms(self.lag["*"]),
+            "endpoints": endpoints,
+        }
+
+
+async def monitor_loop_lag(recorders: list, interval: float, stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        recorder = recorders[-1]
+        recorder.lag["*"].append(lag)
+        for endpoint in recorder.active:
+            recorder.lag[endpoint].append(lag)
+        recorder.active = {endpoint for endpoint, n in recorder.in_flight.items() if n}
+
+
+class LoadClient:
+    """Calls the ASGI app directly, one client address per request."""
+
+    def __init__(self, app, recorders: list):
+        self.app = app
+        self.recorders = recorders
+        self.requests = 0
+
+    async def request(self, endpoint: str, method: str, path: str, body: bytes = b"",
+                      content_type: str = "application/json", token: str | None = None):
+        self.requests += 1
+        n = self.requests
+        headers = [(b"host", b"loadtest"), (b"content-type", content_type.encode()),
+                   (b"content-length", str(len(body)).encode())]
+        if token:
+            headers.append((b"authorization", b"Bearer " + token.encode()))
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "root_path": "", "headers": headers,
+            "server": ("loadtest", 80), "client": (f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}", 1000),
+        }
+        request_sent = False
+        response = {"status": None, "body": []}
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        recorder = self.recorders[-1]
+        recorder.in_flight[endpoint] += 1
+        recorder.active.add(endpoint)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        except Exception as exc:
+            recorder.errors[endpoint] += 1
+            print(f"❌ {endpoint} raised {type(exc).__name__}: {exc}")
+            return None, None
+        finally:
+            recorder.in_flight[endpoint] -= 1
+        recorder.latencies[endpoint].append(time.perf_counter() - started)
+        recorder.statuses[endpoint][response["status"]] += 1
+        return response["status"], b"".join(response["body"])
+
+
+class Workload:
+    def __init__(self, client: LoadClient, photos: list, seed: int):
+        self.client = client
+        self.photos = [multipart_body(photo) for photo in photos]
+        self.rng = random.Random(seed)
+        self.accounts = []
+        self.signups = 0
+
+    @staticmethod
+    def _tokens(body: bytes) -> dict:
+        return json.loads(body)["data"]["tokens"]
+
+    async def signup(self) -> None:
+        n = self.signups
+        self.signups += 1
+        payload = {"username": f"load{n}", "name": "Load Test", "age": 20 + n % 80, "gender": "na",
+                   "phone": f"+1555{n:07d}", "password": PASSWORD}
+        status, body = await self.client.request("signup", "POST", "/api/v1/auth/signup", json.dumps(payload).encode())
+        if status == 200:
+            self.accounts.append({"username": payload["username"], **self._tokens(body)})
+
+    async def login(self, account: dict) -> None:
+        payload = {"username": account["username"], "password": PASSWORD}
+        status, body = await self.client.request("login", "POST", "/api/v1/auth/login", json.dumps(payload).encode())
+        if status == 200:
+            account.update(self._tokens(body))
+
+    async def refresh(self, account: dict) -> None:
+        payload = {"refresh_token": account["refresh_token"]}
+        status, body = await self.client.request("refresh", "POST", "/api/v1/auth/refresh", json.dumps(payload).encode())
+        if status == 200:
+            account["access_token"] = json.loads(body)["data"]["access_token"]
+
+    async def profile(self, account: dict) -> None:
+        await self.client.request("profile", "GET", "/api/v1/users/me", token=account["access_token"])
+
+    async def photo(self, account: dict) -> None:
+        await self.client.request(
+            "photo", "POST", "/api/v1/users/me/photo", self.rng.choice(self.photos),
+            content_type=f"multipart/form-data; boundary={MULTIPART_BOUNDARY}", token=account["access_token"],
+        )
+
+    async def run_mixed(self, mix: dict, concurrency: int, duration: float) -> None:
+        names, weights = list(mix), list(mix.values())
+        deadline = time.perf_counter() + duration
+
+        async def virtual_user():
+            while time.perf_counter() < deadline:
+                name = self.rng.choices(names, weights)[0]
+                if name == "signup" or not self.accounts:
+                    await self.signup()
+                else:
+                    await getattr(self, name)(self.rng.choice(self.accounts))
+
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+
+
+async def bounded(coroutines, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(coroutine):
+        async with semaphore:
+            await coroutine
+
+    await asyncio.gather(*(limited(coroutine) for coroutine in coroutines))
+
+
+async def connect(mongo_url: str | None):
+    if mongo_url:
+        client = motor.motor_asyncio.AsyncIOMotorClient(mongo_url)
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("The in-memory backend needs mongomock-motor (pip install mongomock-motor); "
+                             "or pass --mongo-url.")
+        client = AsyncMongoMockClient()
+    database = client[f"{service.settings.MONGO_DB_NAME}_load_{os.getpid()}"]
+    await init_beanie(database=database, document_models=[User, Prediction])
+    return client, database
+
+
+async def run(args) -> dict:
+    client, database = await connect(args.mongo_url)
+    service.password_hasher.rounds = args.rounds
+    upload_dir = tempfile.TemporaryDirectory(prefix="load-test-uploads-")
+    service.photo_store.shutdown()
+    service.photo_store = PhotoStore(Path(upload_dir.name), url_prefix="/uploads",
+                                     workers=service.settings.PHOTO_VARIANT_WORKERS)
+
+    recorders = [LoadRecorder()]
+    workload = Workload(LoadClient(service.app, recorders), make_photos(PHOTO_POOL_SIZE), args.seed)
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(recorders, args.lag_interval_ms / 1000, stop))
+    phases = {}
+    try:
+        # Warm up the app (middleware stack, password pool, photo pool) outside the measurements
+        await workload.signup()
+        if workload.accounts:
+            await workload.photo(workload.accounts[0])
+
+        for phase in ("signup", "login", "mixed"):
+            recorders.append(LoadRecorder())
+            if phase == "signup":
+                await bounded([workload.signup() for _ in range(args.users)], args.users)
+            elif phase == "login":
+                await bounded([workload.login(account) for account in list(workload.accounts)], args.concurrency)
+            else:
+                await workload.run_mixed(args.mix, args.concurrency, args.duration)
+            recorders[-1].finished = time.perf_counter()
+            phases[phase] = recorders[-1].summary()
+    finally:
+        stop.set()
+        await monitor
+        if args.mongo_url:
+            await client.drop_database(database.name)
+        await service.heart_risk.aclose()
+        service.password_hasher.shutdown()
+        service.photo_store.shutdown()
+        service.bulk_importer.shutdown()
+        upload_dir.cleanup()
+
+    return {
+        "meta": {
+            "backend": "mongodb" if args.mongo_url else "in-memory",
+            "users": args.users, "concurrency": args.concurrency, "duration": args.duration,
+            "mix": args.mix, "bcrypt_rounds": args.rounds, "seed": args.seed,
+        },
+        "phases": phases,
+        "warmup": recorders[0].summary(),
+    }
+
+
+def report(results: dict) -> int:
+    """Prints one row per phase and endpoint; returns the number of failed requests."""
+    failures = 0
+    print(f"{'phase':<7} {'endpoint':<8} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'lag p99':>8} {'lag max':>8}  statuses")
+    for phase, summary in results["phases"].items():
+        for endpoint, stats in summary["endpoints"].items():
+            latency, lag = stats["latency"], stats["loop_lag"]
+            print(f"{phase:<7} {endpoint:<8} {stats['requests']:>8} {stats['throughput']:>8.1f} "
+                  f"{latency.get('p50_ms', 0):>8.2f} {latency.get('p90_ms', 0):>8.2f} {latency.get('p99_ms', 0):>8.2f} "
+                  f"{latency.get('max_ms', 0):>8.2f} {lag.get('p99_ms', 0):>8.2f} {lag.get('max_ms', 0):>8.2f}  "
+                  f"{stats['statuses']}" + (f" errors={stats['errors']}" if stats["errors"] else ""))
+            failures += stats["failed"]
+        lag = summary["loop_lag"]
+        print(f"{phase:<7} {'all':<8} {summary['requests']:>8} {summary['throughput']:>8.1f} "
+              f"{'':>35} {lag.get('p99_ms', 0):>8.2f} {lag.get('max_ms', 0):>8.2f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the auth and profile API in process.")
+    parser.add_argument("--users", type=int, default=200, help="Concurrent signups in the burst (and logins in the storm)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Virtual users in the login storm and mixed phase")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of mixed traffic")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Mixed-phase weights (default {DEFAULT_MIX})")
+    parser.add_argument("--mongo-url", help="Use this MongoDB instead of the in-memory backend")
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost used for the run")
+    parser.add_argument("--lag-interval-ms", type=float, default=5.0, help="Event-loop lag sampling interval")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    failures = report(results)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"✅ Saved load test results to {args.output}.")
+    if failures:
+        print(f"❌ {failures} request(s) failed.")
+        raise SystemExit(1)
+    print("✅ Every request succeeded.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Microbenchmark for the rate limiter storages.
+
+Measures the per-hit cost of limits' fixed-window strategy on memory:// and
+sharedfile:// (raw storage.incr and the full limiter.hit used per request),
+then hammers one shared key from several processes to check that no hit is
+lost between workers.
+
+    cd backend && python -m benchmarks.rate_limit --budget-us 5
+
+Exits with status 1 if a sharedfile:// limiter.hit costs more than
+--budget-us on top of a memory:// one (the price of sharing counters between
+workers), or if any hit was lost.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import src.ratelimit  # noqa: F401  (registers sharedfile://)
+
+LIMIT = parse("5 per minute")
+
+
+def per_call_us(fn, n):
+    for i in range(min(n, 1000)):
+        fn(i)
+    started = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def bench_storage(uri, n, keys):
+    storage = storage_from_string(uri)
+    limiter = FixedWindowRateLimiter(storage)
+    key_names = [f"bench/{i}" for i in range(keys)]
+    return {
+        "incr_us": per_call_us(lambda i: storage.incr(key_names[i % keys], 60), n),
+        "hit_us": per_call_us(lambda i: limiter.hit(LIMIT, "login", "10.0.0.1", key_names[i % keys]), n),
+    }
+
+
+def _hammer(uri, hits):
+    storage = storage_from_string(uri)
+    for _ in range(hits):
+        storage.incr("bench/shared", 60)
+
+
+def check_multiprocess(uri, processes, hits):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_hammer, args=(uri, hits)) for _ in range(processes)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - started
+    return storage_from_string(uri).get("bench/shared"), processes * hits, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rate limiter storages.")
+    parser.add_argument("--n", type=int, default=200_000, help="Hits per measurement")
+    parser.add_argument("--keys", type=int, default=1000, help="Distinct keys cycled through")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--budget-us", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shared_uri = f"sharedfile://{os.path.join(tmp, 'ratelimit.bin')}"
+        results = {"memory://": bench_storage("memory://", args.n, args.keys),
+                   "sharedfile://": bench_storage(shared_uri, args.n, args.keys)}
+        for uri, timings in results.items():
+            print(f"{uri:<15} incr {timings['incr_us']:6.2f} us   limiter.hit {timings['hit_us']:6.2f} us")
+        overhead = results["sharedfile://"]["hit_us"] - results["memory://"]["hit_us"]
+        print(f"sharedfile:// overhead per request: {overhead:+.2f} us")
+
+        storage_from_string(shared_uri).reset()
+        counted, expected, wall = check_multiprocess(shared_uri, args.processes, args.n // args.processes)
+        print(f"{args.processes} processes x {args.n // args.processes} hits on one key: "
+              f"counted {counted}/{expected} in {wall:.2f}s")
+
+    if counted != expected:
+        print("❌ Hits were lost between processes.")
+        raise SystemExit(1)
+    if overhead > args.budget_us:
+        print(f"❌ sharedfile:// overhead exceeds the {args.budget_us} us budget.")
+        raise SystemExit(1)
+    print("✅ Within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Concurrency check for signup and profile updates.
+
+Fires concurrent signups for one username and concurrent PATCH /users/me
+requests claiming one phone number through the ASGI app, then checks that
+the unique indexes let exactly one of each through. The output also shows
+the Mongo round trips per request.
+
+    cd backend && python -m benchmarks.signup_race --concurrency 50
+    cd backend && python -m benchmarks.signup_race --mongo-url mongodb://localhost:27017
+
+Like load_test, it needs no backend/.env. By default it runs against an
+in-memory MongoDB (mongomock-motor, pip install mongomock-motor), which
+enforces the unique indexes; round trips are counted per motor collection
+call, under the wire command each call sends. With --mongo-url it uses a
+throwaway database on a real mongod (dropped at the end) and counts the
+commands the driver actually sends with a pymongo CommandListener. Exits
+with status 1 if a duplicate got through.
+
+Measured here with the in-memory backend, before and after signup and
+profile updates stopped checking for conflicts first: a signup takes 1
+round trip (insert) instead of 2 (find, insert), and an uncontended profile
+update takes 2 (the find behind get_current_user, findAndModify) instead of
+3 (the same find, a find for the phone check, findAndModify from save()).
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import os
+from collections import Counter
+
+import httpx
+from dotenv import load_dotenv
+
+# Enough configuration to import the app without a backend/.env
+load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
+for _name, _value in {
+    "MONGO_URL": "mongodb://localhost:27017", "MONGO_DB_NAME": "healthapp",
+    "JWT_ACCESS_SECRET": "signup-race-access", "JWT_REFRESH_SECRET": "signup-race-refresh",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "15", "REFRESH_TOKEN_EXPIRE_DAYS": "7",
+    "ALLOWED_ORIGINS": "http://localhost",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import motor.motor_asyncio  # noqa: E402
+from beanie import init_beanie  # noqa: E402
+from pymongo import monitoring  # noqa: E402
+
+import src.main as service  # noqa: E402
+from src.models import User  # noqa: E402
+
+# Wire command behind each motor collection method, so the in-memory backend
+# counts what a CommandListener on a real mongod would
+MOCK_COMMANDS = {
+    "find": "find", "find_one": "find", "aggregate": "aggregate", "count_documents": "aggregate",
+    "insert_one": "insert", "insert_many": "insert",
+    "update_one": "update", "update_many": "update", "replace_one": "update",
+    "find_one_and_update": "findAndModify", "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify", "delete_one": "delete", "delete_many": "delete",
+}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def count_mock_commands(collection_class, counter: CommandCounter) -> None:
+    """Counts every call to the mongomock-motor collection methods in MOCK_COMMANDS."""
+    for method_name, command in MOCK_COMMANDS.items():
+        method = getattr(collection_class, method_name)
+        if inspect.iscoroutinefunction(method):
+            async def counted(self, *args, _method=method, _command=command, **kwargs):
+                counter.commands[_command] += 1
+                return await _method(self, *args, **kwargs)
+        else:
+            def counted(self, *args, _method=method, _command=command, **kwargs):
+                counter.commands[_command] += 1
+                return _method(self, *args, **kwargs)
+        setattr(collection_class, method_name, functools.wraps(method)(counted))
+
+
+async def connect(mongo_url: str | None, counter: CommandCounter):
+    if mongo_url:
+        client = motor.motor_asyncio.AsyncIOMotorClient(mongo_url, event_listeners=[counter])
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+        except ImportError:
+            raise SystemExit("The in-memory backend needs mongomock-motor (pip install mongomock-motor); "
+                             "or pass --mongo-url")
+        count_mock_commands(AsyncMongoMockCollection, counter)
+        client = AsyncMongoMockClient()
+    database = client[f"{service.settings.MONGO_DB_NAME}_race_{os.getpid()}"]
+    await init_beanie(database=database, document_models=[User])
+    return client, database
+
+
+def _client(i, headers=None):
+    # A distinct client address per request keeps the per-IP limits out of the way
+    transport = httpx.ASGITransport(app=service.app, client=(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}", 1000))
+    return httpx.AsyncClient(transport=transport, base_url="http://race", headers=headers)
+
+
+async def _request(i, method, path, json, headers=None):
+    async with _client(i, headers) as client:
+        return (await client.request(method, path, json=json)).status_code
+
+
+async def run(args):
+    counter = CommandCounter()
+    client, database = await connect(args.mongo_url, counter)
+    service.password_hasher.rounds = args.rounds
+    failures = 0
+    try:
+        counter.commands.clear()
+        statuses = Counter(await asyncio.gather(*(
+            _request(i, "POST", "/api/v1/auth/signup", {
+                "username": "race", "name": "Race", "age": 30, "gender": "na",
+                "phone": f"+1555{i:07d}", "password": "Passw0rdRace",
+            }) for i in range(args.concurrency)
+        )))
+        commands = dict(counter.commands)  # before the checks' own queries
+        created = await User.find(User.username == "race").count()
+        print(f"signup x{args.concurrency} same username: {dict(statuses)}, users created: {created}, "
+              f"mongo commands: {commands} ({sum(commands.values()) / args.concurrency:.2f} per request)")
+        failures += created != 1 or statuses[200] != 1
+
+        tokens = []
+        for i in range(args.concurrency):
+            user = User(username=f"race{i}", name="Race", age=30, gender="na", phone=f"+1666{i:07d}", password_hash="x")
+            await user.insert()
+            tokens.append(service.create_access_token(str(user.id)))
+        service.user_cache.enabled = False  # count the lookup each request really makes
+        counter.commands.clear()
+        statuses = Counter(await asyncio.gather(*(
+            _request(i, "PATCH", "/api/v1/users/me", {"phone": "+17770000000"},
+                     headers={"Authorization": f"Bearer {token}"})
+            for i, token in enumerate(tokens)
+        )))
+        commands = dict(counter.commands)  # before the checks' own queries
+        holders = await User.find(User.phone == "+17770000000").count()
+        print(f"PATCH x{args.concurrency} same phone: {dict(statuses)}, users holding it: {holders}, "
+              f"mongo commands: {commands} ({sum(commands.values()) / args.concurrency:.2f} per request)")
+        failures += holders != 1 or statuses[200] != 1
+    finally:
+        if args.mongo_url:
+            await client.drop_database(database.name)
+        service.password_hasher.shutdown()
+
+    if failures:
+        print("❌ A duplicate got past the unique indexes.")
+        raise SystemExit(1)
+    print("✅ No duplicates.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Race signups and profile updates against MongoDB.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost used for the run")
+    parser.add_argument("--mongo-url", help="Run against this mongod instead of the in-memory backend")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Bulk user import from NDJSON or CSV records shaped like UserCreate.
+
+Used by POST /api/v1/admin/users/import and from the command line:
+
+    cd backend && python -m src.bulk_import clinic_users.csv --workers 4
+
+Rows are processed in batches: validated together, passwords hashed across a
+process pool, and written with one unordered insert_many. Username and phone
+conflicts come back from the unique indexes on User, so no per-row lookup is
+made. Progress is reported as NDJSON events (only failed rows are listed).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterable, Iterator
+
+import bcrypt
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from .models import User, UserCreate, USER_CONFLICT_MESSAGES, duplicate_key_field
+
+IMPORT_BATCH_SIZE = 500
+
+
+def _hash_passwords(passwords: list[str], rounds: int) -> list[str]:
+    """Process pool worker."""
+    return [bcrypt.hashpw(p.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8') for p in passwords]
+
+
+def parse_records(lines: Iterable[str], is_csv: bool) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yields (row, record, error) for every non-blank input line; rows are zero-based."""
+    lines = (line for line in lines if line.strip())
+    if is_csv:
+        for row, record in enumerate(csv.DictReader(lines)):
+            record.pop(None, None)  # values beyond the header
+            yield row, record, None
+        return
+    for row, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield row, None, f"Invalid JSON: {exc.msg}"
+            continue
+        if isinstance(record, dict):
+            yield row, record, None
+        else:
+            yield row, None, "Each line must be a JSON object"
+
+
+def _validation_message(exc: ValidationError) -> str:
+    # Same wording as the API's RequestValidationError handler
+    error = exc.errors()[0]
+    field = error['loc'][-1] if error['loc'] else "record"
+    return f"Validation error in field '{field}': {error['msg']}"
+
+
+class BulkImporter:
+    """Runs imports batch by batch; the hashing process pool is started on first use."""
+
+    def __init__(self, rounds: int = 12, workers: int = 2, batch_size: int = IMPORT_BATCH_SIZE):
+        self.rounds = rounds
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the parent runs threads (bcrypt pool, Mongo driver)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _hash_all(self, passwords: list[str]) -> list[str]:
+        loop = asyncio.get_running_loop()
+        size = -(-len(passwords) // self.workers)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self._pool(), _hash_passwords, passwords[i:i + size], self.rounds)
+            for i in range(0, len(passwords), size)
+        ))
+        return [password_hash for part in parts for password_hash in part]
+
+    async def _import_batch(self, batch, totals: dict) -> list[dict]:
+        events = []
+        valid = []
+        for row, record, error in batch:
+            if error is None:
+                try:
+                    valid.append((row, UserCreate.model_validate(record)))
+                    continue
+                except ValidationError as exc:
+                    error = _validation_message(exc)
+            events.append({"type": "row", "row": row, "status": "invalid", "error": error})
+        totals["invalid"] += len(events)
+
+        failed = {}
+        if valid:
+            hashes = await self._hash_all([payload.password for _, payload in valid])
+            users = [
+                User(**payload.model_dump(exclude={"password"}), password_hash=password_hash)
+                for (_, payload), password_hash in zip(valid, hashes)
+            ]
+            try:
+                await User.insert_many(users, ordered=False)
+            except BulkWriteError as exc:
+                failed = {error["index"]: error for error in exc.details.get("writeErrors", [])}
+
+        for index, error in failed.items():
+            row = valid[index][0]
+            field = duplicate_key_field(error) if error.get("code") == 11000 else None
+            if field:
+                totals["conflicts"] += 1
+                events.append({"type": "row", "row": row, "status": "conflict", "field": field,
+                               "error": USER_CONFLICT_MESSAGES[field]})
+            else:
+                totals["failed"] += 1
+                events.append({"type": "row", "row": row, "status": "error", "error": error.get("errmsg", "Write failed")})
+        totals["inserted"] += len(valid) - len(failed)
+        totals["processed"] += len(batch)
+
+        events.sort(key=lambda event: event["row"])
+        events.append({"type": "progress", **totals})
+        return events
+
+    async def run(self, records: Iterable[tuple[int, dict | None, str | None]]) -> AsyncIterator[dict]:
+        """Imports parse_records() output, yielding failed rows and a progress event per batch."""
+        totals = {"processed": 0, "inserted": 0, "invalid": 0, "conflicts": 0, "failed": 0}
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                for event in await self._import_batch(batch, totals):
+                    yield event
+                batch = []
+        if batch:
+            for event in await self._import_batch(batch, totals):
+                yield event
+        yield {"type": "summary", **totals}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+async def _run_cli(args) -> dict:
+    import motor.motor_asyncio
+    from beanie import init_beanie
+    from .main import settings
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_URL)
+    await init_beanie(database=client[settings.MONGO_DB_NAME], document_models=[User])
+    importer = BulkImporter(settings.BCRYPT_ROUNDS, args.workers, args.batch_size)
+    is_csv = args.format == "csv" if args.format else args.path.lower().endswith(".csv")
+    summary = {}
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as fh:
+            async for event in importer.run(parse_records(fh, is_csv)):
+                print(json.dumps(event), flush=True)
+                summary = event
+    finally:
+        importer.shutdown()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import users from NDJSON or CSV.")
+    parser.add_argument("path", help="NDJSON (one UserCreate object per line) or CSV with a header row")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Default: from the file extension")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Hashing processes")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    summary = asyncio.run(_run_cli(args))
+    failed = summary.get("invalid", 0) + summary.get("conflicts", 0) + summary.get("failed", 0)
+    print(f"✅ Imported {summary.get('inserted', 0)} users, {failed} rows rejected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Gateway from the backend to the heart-risk service (ml/heart-risk), used by
+POST /api/v1/heart-risk/predict.
+
+HeartRiskGateway.predict() answers in one of three ways:
+
+- From the cache: results are kept per feature vector (LRU + TTL). The model
+  is a pure function of the ten inputs, and the TTL bounds how long a model
+  reloaded by the service takes to show.
+- In process, when an engine is configured (HEART_RISK_ENGINE="module:callable"):
+  the callable takes the feature dict, returns the /predict payload and runs in
+  the threadpool. No HTTP is involved.
+- Over HTTP, through one long-lived httpx.AsyncClient per worker. Keep-alive
+  connections are pooled, and every call has connect and read timeouts.
+  Connection errors, timeouts and 502/503/504 answers are retried with a
+  short backoff while the retry budget allows. The budget lets retries add
+  at most retry_ratio extra calls, plus a small allowance per second, so an
+  outage does not multiply the load on the service.
+
+Tests can stand in for the service with stub_engine
+(HEART_RISK_ENGINE=src.heart_risk:stub_engine). They can also pass an httpx
+transport such as httpx.MockTransport or an ASGITransport around a stub app.
+"""
+import asyncio
+import importlib
+import math
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import httpx
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from .metrics import operation_timer
+from .models import HeartRiskInput, HeartRiskPrediction
+
+FEATURES = list(HeartRiskInput.model_fields)
+RETRY_STATUSES = {502, 503, 504}
+RETRY_BACKOFF_SECONDS = 0.05
+
+PREDICT_TIMER = operation_timer("heart_risk_predict")
+
+
+class HeartRiskUnavailable(Exception):
+    """The service (or engine) could not produce a prediction."""
+
+
+def load_engine(path: str) -> Callable[[dict], dict]:
+    """Resolves "package.module:callable"."""
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        raise ValueError(f"HEART_RISK_ENGINE must look like 'module:callable', got {path!r}")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def stub_engine(features: dict) -> dict:
+    """Deterministic stand-in for the heart-risk service in tests."""
+    score = (features["Age"] - 50) / 10 + sum(features[name] for name in FEATURES[2:]) - 2
+    probability = 1 / (1 + math.exp(-score))
+    risk_level = "Low Risk" if probability < 0.3 else "Medium Risk" if probability < 0.6 else "High Risk"
+    return {
+        "risk_level": risk_level,
+        "advice": "Stub prediction.",
+        "probability": probability,
+        "urgent_warning": "",
+        "personalized_tips": [],
+        "general_tips": [],
+    }
+
+
+class RetryBudget:
+    """
+    Token bucket for retries. Every request deposits `ratio` tokens and every
+    retry withdraws one. The balance also refills by min_per_second and is
+    capped at max_balance.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_balance: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self._refilled_at = time.monotonic()
+
+    def _refill(self, amount: float = 0.0) -> None:
+        now = time.monotonic()
+        earned = (now - self._refilled_at) * self.min_per_second + amount
+        self.balance = min(self.max_balance, self.balance + earned)
+        self._refilled_at = now
+
+    def deposit(self) -> None:
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class PredictionCache:
+    """Bounded LRU + TTL map from feature vector to prediction."""
+
+    def __init__(self, max_size: int = 10_000, ttl_seconds: float = 300.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = max_size > 0 and ttl_seconds > 0
+        self._entries: OrderedDict[tuple, tuple[float, HeartRiskPrediction]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> HeartRiskPrediction | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: tuple, prediction: HeartRiskPrediction) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, prediction)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class HeartRiskGateway:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8001",
+        engine: str | Callable[[dict], dict] | None = None,
+        timeout: float = 5.0,
+        connect_timeout: float = 1.0,
+        max_connections: int = 20,
+        retries: int = 2,
+        retry_ratio: float = 0.2,
+        cache_size: int = 10_000,
+        cache_ttl_seconds: float = 300.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.engine = load_engine(engine) if isinstance(engine, str) and engine else engine or None
+        self.retries = retries
+        self.budget = RetryBudget(retry_ratio)
+        self.cache = PredictionCache(cache_size, cache_ttl_seconds)
+        self._client = None
+        if self.engine is None:
+            self._client = httpx.AsyncClient(
+                base_url=base_url,
+                timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                transport=transport,
+            )
+        self.requests = 0
+        self.service_calls = 0
+        self.engine_calls = 0
+        self.retried = 0
+        self.retries_denied = 0
+        self.failures = 0
+
+    async def predict(self, features: HeartRiskInput) -> tuple[HeartRiskPrediction, str]:
+        """Returns (prediction, source) with source "cache", "engine" or "service"."""
+        self.requests += 1
+        values = features.model_dump()
+        key = tuple(values[name] for name in FEATURES)
+        prediction = self.cache.get(key)
+        if prediction is not None:
+            return prediction, "cache"
+
+        with PREDICT_TIMER.time():
+            if self.engine is not None:
+                self.engine_calls += 1
+                try:
+                    payload = await run_in_threadpool(self.engine, values)
+                except Exception as exc:
+                    self.failures += 1
+                    raise HeartRiskUnavailable(f"Engine failed: {exc}") from exc
+                source = "engine"
+            else:
+                payload = await self._post(values)
+                source = "service"
+        try:
+            prediction = HeartRiskPrediction.model_validate(payload)
+        except ValidationError as exc:
+            self.failures += 1
+            raise HeartRiskUnavailable("Unexpected prediction payload") from exc
+        self.cache.put(key, prediction)
+        return prediction, source
+
+    async def _post(self, values: dict) -> dict:
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            self.service_calls += 1
+            try:
+                response = await self._client.post("/predict", json=values)
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                error = f"Service answered {response.status_code}"
+            except httpx.TransportError as exc:
+                error = f"Service unreachable ({type(exc).__name__})"
+            if attempt >= self.retries:
+                self.failures += 1
+                raise HeartRiskUnavailable(error)
+            if not self.budget.withdraw():
+                self.retries_denied += 1
+                self.failures += 1
+                raise HeartRiskUnavailable(error)
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS * attempt)
+
+        if response.status_code != 200:
+            self.failures += 1
+            raise HeartRiskUnavailable(f"Service answered {response.status_code}")
+        try:
+            payload = response.json()
+        except ValueError:
+            self.failures += 1
+            raise HeartRiskUnavailable("Service answered with invalid JSON")
+        if "error" in payload:  # {"error": "Model not loaded"}
+            self.failures += 1
+            raise HeartRiskUnavailable(payload["error"])
+        return payload
+
+    def stats(self) -> dict:
+        return {
+            "mode": "engine" if self.engine is not None else "service",
+            "requests": self.requests,
+            "cache_size": len(self.cache),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "service_calls": self.service_calls,
+            "engine_calls": self.engine_calls,
+            "retries": self.retried,
+            "retries_denied": self.retries_denied,
+            "failures": self.failures,
+            "retry_budget": self.budget.balance,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
@@ -1,12 +1,14 @@
+import hmac
+import json
 import os
+import time
 import uuid
-import bcrypt
 from pathlib import Path
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import FastAPI, HTTPException, status, Depends, Request, UploadFile, File
+from fastapi import FastAPI, HTTPException, status, Depends, Request, UploadFile, File, BackgroundTasks, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
@@ -15,12 +17,16 @@ from dotenv import load_dotenv
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from limits import parse as parse_rate_limit
 import motor.motor_asyncio
-from beanie import init_beanie
-from fastapi.responses import JSONResponse
+from beanie import init_beanie, UpdateResponse
+from beanie.operators import Set
+from pymongo import monitoring
+from pymongo.errors import DuplicateKeyError
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.encoders import jsonable_encoder
-from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
 # --- 1. CONFIGURATION ---
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
@@ -33,6 +39,36 @@ class Settings(BaseSettings):
     REFRESH_TOKEN_EXPIRE_DAYS: int
     ALLOWED_ORIGINS: str
     ALLOWED_ORIGIN_REGEX: str | None = None
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    PHOTO_VARIANT_WORKERS: int = 1
+    # memory:// is per worker; use sharedfile:///path for all workers on one
+    # host, or redis://, memcached:// or mongodb:// to share across hosts
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    # Admin routes expect this in an X-Admin-Token header; unset disables them
+    ADMIN_TOKEN: str | None = None
+    BULK_IMPORT_WORKERS: int = 2
+    # Request profiling: requests with an X-Profile header signed with
+    # ADMIN_TOKEN (see profiling.py), plus this fraction of all requests
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 2.0
+    PROFILE_BUFFER_SIZE: int = 50
+    # Heart-risk gateway (see heart_risk.py). HEART_RISK_ENGINE="module:callable"
+    # predicts in process instead of calling ML_API_BASE. The default only
+    # reaches a service on the same host; docker-compose.yml sets the compose name.
+    ML_API_BASE: str = "http://localhost:8001"
+    HEART_RISK_ENGINE: str = ""
+    HEART_RISK_TIMEOUT_SECONDS: float = 5.0
+    HEART_RISK_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    HEART_RISK_MAX_CONNECTIONS: int = 20
+    HEART_RISK_RETRIES: int = 2
+    HEART_RISK_RETRY_RATIO: float = 0.2
+    HEART_RISK_CACHE_SIZE: int = 10000
+    HEART_RISK_CACHE_TTL_SECONDS: float = 300.0
 
 settings = Settings()
 
@@ -51,26 +87,95 @@ MAX_PHOTO_SIZE_BYTES = 5 * 1024 * 1024  # 5 MB
 from .models import (
     User, UserCreate, UserLogin, SignupResponse, 
     TokenRefresh, TokenResponse, ForgotPasswordRequest, ForgotPasswordResponse,
-    UserResponse, UserUpdate, ErrorDetail, ErrorResponse, SuccessResponse
+    UserResponse, UserUpdate, ErrorDetail, ErrorResponse, SuccessResponse,
+    HeartRiskInput, HeartRiskPrediction, Prediction, PredictionRecord,
+    USER_CONFLICT_MESSAGES, duplicate_key_field
+)
+from .passwords import PasswordHasher, PasswordPoolFull
+from .user_cache import UserCache
+from .bulk_import import BulkImporter, parse_records
+from .heart_risk import HeartRiskGateway, HeartRiskUnavailable
+from .responses import FastJSONResponse, auth_response, error_response, success_response, user_response
+from .profiling import Profiler, ProfilerMiddleware
+from .metrics import MetricsMiddleware, OPERATION_LATENCY, metrics_response, operation_timer, register_stats
+from . import ratelimit  # registers the sharedfile:// limiter storage
+from .photos import (
+    PhotoStore, PhotoRejected, PhotoTooLarge, UploadLimitMiddleware, PHOTO_VARIANTS,
+    IMMUTABLE_CACHE_CONTROL, if_none_match
 )
 
-limiter = Limiter(key_func=get_remote_address,default_limits=["100 per 15 minutes"])
+limiter = Limiter(key_func=get_remote_address,default_limits=["100 per 15 minutes"], storage_uri=settings.RATE_LIMIT_STORAGE_URI)
+# Per username and IP. The route's per-IP limit is the same 5 per minute and
+# caps password spraying; this one keeps each account's budget separate if the
+# route limit is ever raised for clients behind a shared NAT
+LOGIN_RATE_LIMIT = parse_rate_limit("5 per minute")
 security = HTTPBearer()
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    enabled=settings.USER_CACHE_ENABLED,
+)
+bulk_importer = BulkImporter(rounds=settings.BCRYPT_ROUNDS, workers=settings.BULK_IMPORT_WORKERS)
+profiler = Profiler(
+    secret=settings.ADMIN_TOKEN or "",
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    interval_ms=settings.PROFILE_INTERVAL_MS,
+    buffer_size=settings.PROFILE_BUFFER_SIZE,
+)
+heart_risk = HeartRiskGateway(
+    base_url=settings.ML_API_BASE,
+    engine=settings.HEART_RISK_ENGINE,
+    timeout=settings.HEART_RISK_TIMEOUT_SECONDS,
+    connect_timeout=settings.HEART_RISK_CONNECT_TIMEOUT_SECONDS,
+    max_connections=settings.HEART_RISK_MAX_CONNECTIONS,
+    retries=settings.HEART_RISK_RETRIES,
+    retry_ratio=settings.HEART_RISK_RETRY_RATIO,
+    cache_size=settings.HEART_RISK_CACHE_SIZE,
+    cache_ttl_seconds=settings.HEART_RISK_CACHE_TTL_SECONDS,
+)
+photo_store = PhotoStore(UPLOAD_DIR, url_prefix="/uploads", workers=settings.PHOTO_VARIANT_WORKERS)
+PhotoVariant = Literal[("original", *PHOTO_VARIANTS)]
 # --- 3. SECURITY & DEPENDENCIES ---
 
+SERVER_BUSY = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, please try again shortly.", headers={"Retry-After": "1"})
+HEART_RISK_UNAVAILABLE = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Heart risk prediction is unavailable, please try again shortly.", headers={"Retry-After": "5"})
+
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordPoolFull:
+        raise SERVER_BUSY
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    try:
+        return await password_hasher.verify(password, password_hash)
+    except PasswordPoolFull:
+        raise SERVER_BUSY
+
+JWT_ENCODE_TIMER = operation_timer("jwt_encode")
+JWT_DECODE_TIMER = operation_timer("jwt_decode")
+
 def create_access_token(user_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"exp": expire, "sub": user_id}
-    return jwt.encode(to_encode, settings.JWT_ACCESS_SECRET, algorithm="HS256")
+    with JWT_ENCODE_TIMER.time():
+        return jwt.encode(to_encode, settings.JWT_ACCESS_SECRET, algorithm="HS256")
 
 def create_refresh_token(user_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode = {"exp": expire, "sub": user_id}
-    return jwt.encode(to_encode, settings.JWT_REFRESH_SECRET, algorithm="HS256")
+    with JWT_ENCODE_TIMER.time():
+        return jwt.encode(to_encode, settings.JWT_REFRESH_SECRET, algorithm="HS256")
 
 def verify_access_token(token: str) -> str:
     try:
-        payload = jwt.decode(token, settings.JWT_ACCESS_SECRET, algorithms=["HS256"])
+        with JWT_DECODE_TIMER.time():
+            payload = jwt.decode(token, settings.JWT_ACCESS_SECRET, algorithms=["HS256"])
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
@@ -80,7 +185,8 @@ def verify_access_token(token: str) -> str:
 
 def verify_refresh_token(token: str) -> str:
     try:
-        payload = jwt.decode(token, settings.JWT_REFRESH_SECRET, algorithms=["HS256"])
+        with JWT_DECODE_TIMER.time():
+            payload = jwt.decode(token, settings.JWT_REFRESH_SECRET, algorithms=["HS256"])
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -93,21 +199,73 @@ async def get_current_user(
 ) -> User:
     token = credentials.credentials
     user_id = verify_access_token(token)
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    epoch = user_cache.epoch
     user = await User.get(uuid.UUID(user_id))
     if not user:
        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user_cache.put(user_id, user, epoch)
     return user
 
+def user_conflict(exc: DuplicateKeyError) -> HTTPException:
+    """409 for a write rejected by one of User's unique indexes."""
+    field = duplicate_key_field(exc.details or {"errmsg": str(exc)})
+    return HTTPException(status_code=409, detail=USER_CONFLICT_MESSAGES.get(field, "User already exists"))
+
+def require_admin(x_admin_token: Annotated[str, Header()] = "") -> None:
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+def check_login_rate_limit(request: Request, username: str) -> None:
+    identifiers = ("login", get_remote_address(request), username.lower())
+    if not limiter.limiter.hit(LOGIN_RATE_LIMIT, *identifiers):
+        reset_at = limiter.limiter.get_window_stats(LOGIN_RATE_LIMIT, *identifiers).reset_time
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(max(1, int(reset_at - time.time()) + 1))},
+        )
+
+def with_photo_variant(user: User, variant: str | None) -> User:
+    """Points photo_url at the requested resized variant when one was generated."""
+    if variant and variant in user.photo_variants:
+        return user.model_copy(update={"photo_url": user.photo_variants[variant]})
+    return user
+
+async def release_photo(photo_url: str) -> None:
+    """Deletes a replaced photo and its variants unless another user shares the same file."""
+    async def in_use() -> bool:
+        return await User.find_one(User.photo_url == photo_url) is not None
+    await photo_store.release(photo_url, in_use)
+
 # --- 4. DATABASE LIFESPAN ---
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every command the driver sends as operation="mongo_<command>"."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        OPERATION_LATENCY.labels(f"mongo_{event.command_name}").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        OPERATION_LATENCY.labels(f"mongo_{event.command_name}").observe(event.duration_micros / 1e6)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_URL)
-    await init_beanie(database=client[settings.MONGO_DB_NAME], document_models=[User])
+    client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_URL, event_listeners=[MongoCommandMetrics()])
+    await init_beanie(database=client[settings.MONGO_DB_NAME], document_models=[User, Prediction])
     print("Database connection established.")
     yield
+    await heart_risk.aclose()
+    password_hasher.shutdown()
+    photo_store.shutdown()
+    bulk_importer.shutdown()
 
 # --- 5. MAIN APP & ENDPOINTS ---
-app = FastAPI(title="Simple Health App API (MongoDB)", lifespan=lifespan)
+app = FastAPI(title="Simple Health App API (MongoDB)", lifespan=lifespan, default_response_class=FastJSONResponse)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 allowed_origins = [origin.strip() for origin in settings.ALLOWED_ORIGINS.split(',') if origin.strip()]
@@ -120,8 +278,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# Not installed at all unless profiling is configured
+if profiler.enabled:
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+# Bounds the upload body before FastAPI parses (and spools) the form
+app.add_middleware(UploadLimitMiddleware, path="/api/v1/users/me/photo", max_bytes=MAX_PHOTO_SIZE_BYTES)
+# Outermost, so it also times CORS preflights and error responses
+app.add_middleware(MetricsMiddleware)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -134,69 +297,71 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         message=message,
         details=details
     )
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={"success": False, "error": error_detail.model_dump()}
-    )
+    return error_response(status.HTTP_422_UNPROCESSABLE_ENTITY, error_detail)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     error_detail = ErrorDetail(code="HTTP_ERROR", message=str(exc.detail))
-    return JSONResponse(status_code=exc.status_code, content={"success": False, "error": error_detail.model_dump()})
+    return error_response(exc.status_code, error_detail, exc.headers)
 
 
 @app.post("/api/v1/auth/signup", response_model=SuccessResponse[SignupResponse], tags=["Authentication"])
 @limiter.limit("5 per minute")
 async def signup_user(request: Request, payload: UserCreate):
-    if await User.find_one(User.username == payload.username):
-        raise HTTPException(status_code=409, detail="Username already exists")
-    hashed_password = bcrypt.hashpw(payload.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = await hash_password(payload.password)
     new_user = User(**payload.model_dump(exclude={"password"}), password_hash=hashed_password)
-    await new_user.insert()
-    return SuccessResponse(data={
-        "user": new_user,
-        "tokens": {
-            "access_token": create_access_token(str(new_user.id)),
-            "refresh_token": create_refresh_token(str(new_user.id))
-        }
-    })
+    # The unique indexes on username/phone decide conflicts in the same write
+    try:
+        await new_user.insert()
+    except DuplicateKeyError as exc:
+        raise user_conflict(exc)
+    return auth_response(new_user, create_access_token(str(new_user.id)), create_refresh_token(str(new_user.id)))
 
 
 
 @app.patch("/api/v1/users/me", response_model=SuccessResponse[UserResponse], tags=["User"])
-async def update_own_profile(payload: UserUpdate, current_user: Annotated[User, Depends(get_current_user)]):
+async def update_own_profile(
+    payload: UserUpdate,
+    current_user: Annotated[User, Depends(get_current_user)],
+    photo_variant: Annotated[PhotoVariant | None, Query()] = None,
+):
     update_data = payload.model_dump(exclude_unset=True)
-    if not update_data: return current_user
-    if "phone" in update_data and update_data["phone"] != current_user.phone:
-        if await User.find_one(User.phone == update_data["phone"]):
-            raise HTTPException(status_code=409, detail="Phone number is already in use.")
-    for key, value in update_data.items():
-        setattr(current_user, key, value)
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
-    return SuccessResponse(data=current_user)
+    if not update_data: return user_response(with_photo_variant(current_user, photo_variant))
+    update_data["updated_at"] = datetime.utcnow()
+    # One findOneAndUpdate with $set of just these fields; a phone taken by
+    # someone else is rejected by its unique index
+    try:
+        updated_user = await User.find_one(User.id == current_user.id).update(
+            Set(update_data), response_type=UpdateResponse.NEW_DOCUMENT
+        )
+    except DuplicateKeyError as exc:
+        raise user_conflict(exc)
+    if updated_user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user_cache.invalidate(str(current_user.id))
+    return user_response(with_photo_variant(updated_user, photo_variant))
 
 
 @app.post("/api/v1/auth/login", response_model=SuccessResponse[SignupResponse], tags=["Authentication"])
 @limiter.limit("5 per minute")
 async def login_user(request: Request, payload: UserLogin):
+    check_login_rate_limit(request, payload.username)
     user = await User.find_one(User.username == payload.username)
-    if not user or not bcrypt.checkpw(payload.password.encode('utf-8'), user.password_hash.encode('utf-8')):
+    if not user or not await verify_password(payload.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
-    return SuccessResponse(data={
-        "user": user,
-        "tokens": {
-            "access_token": create_access_token(str(user.id)),
-            "refresh_token": create_refresh_token(str(user.id))
-        }
-    })
+    # Upgrade hashes made with an old BCRYPT_ROUNDS
+    new_hash = await password_hasher.rehash_if_needed(payload.password, user.password_hash)
+    if new_hash is not None:
+        await user.set({User.password_hash: new_hash})
+        user_cache.invalidate(str(user.id))
+    return auth_response(user, create_access_token(str(user.id)), create_refresh_token(str(user.id)))
 
 
 @app.post("/api/v1/auth/refresh", response_model=SuccessResponse[TokenResponse], tags=["Authentication"])
 @limiter.limit("10/minute")
 async def refresh_access_token(request: Request, payload: TokenRefresh):
     user_id = verify_refresh_token(payload.refresh_token)
-    return SuccessResponse(data={
+    return success_response(TokenResponse, {
         "access_token": create_access_token(user_id),
         "refresh_token": payload.refresh_token,
         "token_type": "bearer"
@@ -209,57 +374,140 @@ async def logout_user():
 @app.post("/api/v1/auth/forgot-password", response_model=SuccessResponse[ForgotPasswordResponse], tags=["Authentication"])
 async def forgot_password(payload: ForgotPasswordRequest):
     print(f"Received forgot password request for: {payload.phoneOrEmail}")
-    return SuccessResponse(data={
+    return success_response(ForgotPasswordResponse, {
         "message": "If an account with this information exists, a reset link has been sent."
     })
 @app.get("/api/v1/users/me", response_model=SuccessResponse[UserResponse], tags=["User"])
-async def get_own_profile(current_user: Annotated[User, Depends(get_current_user)]):
-    return SuccessResponse(data=current_user)
+async def get_own_profile(
+    current_user: Annotated[User, Depends(get_current_user)],
+    photo_variant: Annotated[PhotoVariant | None, Query()] = None,
+):
+    return user_response(with_photo_variant(current_user, photo_variant))
 
 @app.post("/api/v1/users/me/photo", response_model=SuccessResponse[UserResponse], tags=["User"])
 async def upload_profile_photo(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: Annotated[User, Depends(get_current_user)] = None,
+    photo_variant: Annotated[PhotoVariant | None, Query()] = None,
 ):
-    if file.content_type not in ALLOWED_PHOTO_TYPES:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Unsupported file type. Please upload a JPG, PNG, or WEBP image.",
-        )
-
-    contents = await file.read()
-    if not contents:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Uploaded file is empty.",
-        )
-
-    if len(contents) > MAX_PHOTO_SIZE_BYTES:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="Image is too large. Maximum allowed size is 5MB.",
-        )
-
-    extension = ALLOWED_PHOTO_TYPES[file.content_type]
-    filename = f"{uuid.uuid4()}{extension}"
-    filepath = UPLOAD_DIR / filename
-
-    with open(filepath, "wb") as buffer:
-        buffer.write(contents)
-
-    if current_user.photo_url and current_user.photo_url.startswith("/uploads/"):
-        old_path = BASE_DIR / current_user.photo_url.lstrip("/")
-        if old_path.exists():
-            try:
-                old_path.unlink()
-            except OSError:
-                pass
-
-    current_user.photo_url = f"/uploads/{filename}"
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
-
-    return SuccessResponse(data=current_user)
+    try:
+        # The file cannot be released by another request until the block ends
+        async with photo_store.save(file, ALLOWED_PHOTO_TYPES, MAX_PHOTO_SIZE_BYTES) as photo:
+            # current_user may be a cached copy, so $set only the photo fields (a
+            # full save would revert writes made elsewhere). The document from
+            # before the update gives the photo actually being replaced.
+            update_data = {"photo_url": photo.url, "photo_variants": photo.variants, "updated_at": datetime.utcnow()}
+            previous_user = await User.find_one(User.id == current_user.id).update(
+                Set(update_data), response_type=UpdateResponse.OLD_DOCUMENT
+            )
+    except PhotoRejected as exc:
+        code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE if isinstance(exc, PhotoTooLarge) else status.HTTP_400_BAD_REQUEST
+        raise HTTPException(status_code=code, detail=exc.detail)
+    user_cache.invalidate(str(current_user.id))
+    if previous_user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+    old_photo_url = previous_user.photo_url
+    if old_photo_url and old_photo_url != photo.url:
+        # Removed after the response is sent
+        background_tasks.add_task(release_photo, old_photo_url)
+
+    return user_response(with_photo_variant(previous_user.model_copy(update=update_data), photo_variant))
+
+@app.post("/api/v1/heart-risk/predict", response_model=SuccessResponse[HeartRiskPrediction], tags=["Heart Risk"])
+async def predict_heart_risk(
+    payload: HeartRiskInput,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    try:
+        prediction, source = await heart_risk.predict(payload)
+    except HeartRiskUnavailable as exc:
+        print(f"Heart risk prediction failed: {exc}")
+        raise HEART_RISK_UNAVAILABLE
+    await Prediction(user_id=current_user.id, features=payload, result=prediction, source=source).insert()
+    return success_response(HeartRiskPrediction, prediction)
+
+@app.get("/api/v1/heart-risk/predictions", response_model=SuccessResponse[list[PredictionRecord]], tags=["Heart Risk"])
+async def list_heart_risk_predictions(
+    current_user: Annotated[User, Depends(get_current_user)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """The user's most recent predictions, newest first."""
+    predictions = await Prediction.find(Prediction.user_id == current_user.id).sort(-Prediction.created_at).limit(limit).to_list()
+    return success_response(list[PredictionRecord], predictions)
+
+@app.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_photo(request: Request, file_path: str):
+    photo = photo_store.resolve(file_path)
+    if photo is None or not await run_in_threadpool(photo.path.is_file):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    if photo.etag is None:
+        return FileResponse(photo.path, media_type=photo.media_type)
+    # Content-addressed: the ETag is the hash, so the file can be cached forever.
+    # FileResponse answers Range / If-Range requests itself.
+    headers = {"ETag": photo.etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if if_none_match(request.headers.get("if-none-match"), photo.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(photo.path, media_type=photo.media_type, headers=headers)
+
+@app.post("/api/v1/admin/users/import", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def bulk_import_users(request: Request):
+    """
+    Creates users from an NDJSON body (one UserCreate object per line) or a
+    CSV body with a header row (Content-Type: text/csv). Streams NDJSON back:
+    a "row" event for every rejected row (zero-based), a "progress" event
+    after each batch and a final "summary".
+    """
+    is_csv = request.headers.get("content-type", "").startswith("text/csv")
+    # Buffered before streaming starts so reading the body cannot race the
+    # response's disconnect listener
+    lines = (await request.body()).decode("utf-8-sig").splitlines()
+    events = bulk_importer.run(parse_records(lines, is_csv))
+    return StreamingResponse((json.dumps(event) + "\n" async for event in events), media_type="application/x-ndjson")
+
+register_stats("password_pool", password_hasher.stats)
+register_stats("user_cache", user_cache.stats)
+register_stats("photo_store", photo_store.stats)
+register_stats("heart_risk", heart_risk.stats)
+
+@app.get("/metrics", tags=["System"])
+def prometheus_metrics():
+    """Prometheus text exposition of request, operation and component metrics."""
+    return metrics_response()
+
+@app.get("/api/v1/admin/profiles", tags=["Admin"], dependencies=[Depends(require_admin)])
+def list_profiles():
+    """Request profiles in the ring buffer, oldest first."""
+    return {"success": True, "data": [profile.summary() for profile in profiler.profiles]}
+
+@app.get("/api/v1/admin/profiles/collapsed", tags=["Admin"], dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+def download_profiles():
+    """Every buffered profile as collapsed stacks, one flamegraph root per request."""
+    return profiler.collapsed()
+
+@app.get("/api/v1/admin/profiles/{profile_id}", tags=["Admin"], dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+def download_profile(profile_id: int):
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile.collapsed()
+
+@app.get("/metrics/password-pool", tags=["System"])
+def password_pool_metrics():
+    return {"success": True, "data": password_hasher.stats()}
+
+@app.get("/metrics/user-cache", tags=["System"])
+def user_cache_metrics():
+    return {"success": True, "data": user_cache.stats()}
+
+@app.get("/metrics/photos", tags=["System"])
+def photo_store_metrics():
+    return {"success": True, "data": photo_store.stats()}
+
+@app.get("/metrics/heart-risk", tags=["System"])
+def heart_risk_metrics():
+    return {"success": True, "data": heart_risk.stats()}
 
 @app.get("/healthz", tags=["System"])
 def health_check():
@@ -1,5 +1,6 @@
 import uuid
 from beanie import Document, Indexed
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from pydantic import BaseModel, Field, StringConstraints, field_validator
 from enum import Enum
 from datetime import datetime
@@ -18,12 +19,32 @@ class User(Document):
     gender: GenderEnum
     phone: Annotated[str, Indexed(unique=True)]
     password_hash: str
-    photo_url: Optional[str] = None
+    # Indexed for the shared-file check when a photo is replaced
+    photo_url: Annotated[Optional[str], Indexed()] = None
+    photo_variants: dict[str, str] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     class Settings:
         name = "users"
 
+# Unique indexes on User and the 409 message for each
+USER_CONFLICT_MESSAGES = {
+    "username": "Username already exists",
+    "phone": "Phone number is already in use.",
+}
+
+def duplicate_key_field(error: dict) -> Optional[str]:
+    """The unique User field behind an E11000 write error (DuplicateKeyError.details or a writeErrors entry)."""
+    key_pattern = error.get("keyPattern") or {}
+    for field in USER_CONFLICT_MESSAGES:
+        if field in key_pattern:
+            return field
+    message = error.get("errmsg", "")
+    for field in USER_CONFLICT_MESSAGES:
+        if field in message:
+            return field
+    return None
+
 # --- API Schemas ---
 class UserCreate(BaseModel):
     username: Annotated[str, StringConstraints(min_length=2, max_length=50)]
@@ -58,6 +79,7 @@ class ForgotPasswordResponse(BaseModel):
 
 class UserResponse(BaseModel):
     id: uuid.UUID; username: str; name: str; age: int; gender: GenderEnum; phone: str; photo_url: Optional[str] = None
+    photo_variants: dict[str, str] = {}
     class Config:
         from_attributes = True
 
@@ -82,4 +104,46 @@ class ErrorResponse(BaseModel):
 class SuccessResponse(BaseModel, Generic[T]):
    
     success: bool = True
-    data: T
\ No newline at end of file
+    data: T
+
+# --- Heart risk (same schema as the heart-risk service's /predict) ---
+class HeartRiskInput(BaseModel):
+    Age: float
+    Gender: int
+    High_BP: int
+    High_Cholesterol: int
+    Smoking: int
+    Family_History: int
+    Chronic_Stress: int
+    Shortness_of_Breath: int
+    Pain_Arms_Jaw_Back: int
+    Cold_Sweats_Nausea: int
+
+class TipCategory(BaseModel):
+    title: str
+    points: list[str]
+
+class HeartRiskPrediction(BaseModel):
+    risk_level: str
+    advice: str
+    probability: float
+    urgent_warning: str
+    personalized_tips: list[TipCategory]
+    general_tips: list[str]
+
+class Prediction(Document):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    user_id: uuid.UUID
+    features: HeartRiskInput
+    result: HeartRiskPrediction
+    source: str  # "service", "engine" or "cache"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    class Settings:
+        name = "predictions"
+        # History queries: one user's predictions, newest first
+        indexes = [IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)])]
+
+class PredictionRecord(BaseModel):
+    id: uuid.UUID; features: HeartRiskInput; result: HeartRiskPrediction; created_at: datetime
+    class Config:
+        from_attributes = True
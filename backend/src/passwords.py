@@ -0,0 +1,113 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from .metrics import operation_timer
+
+BCRYPT_HASH_TIMER = operation_timer("bcrypt_hash")
+BCRYPT_VERIFY_TIMER = operation_timer("bcrypt_verify")
+
+
+class PasswordPoolFull(Exception):
+    """Raised when too many hash/verify calls are already waiting for a worker."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, bounded thread pool so hashing never blocks
+    the event loop (bcrypt releases the GIL while it works).
+
+    At most `workers + max_queue` calls may be in flight; beyond that
+    PasswordPoolFull is raised immediately so the caller can answer 503
+    instead of piling up latency.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, max_queue: int = 64):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_in_flight = workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        # Metrics (only touched from the event loop thread)
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.work_seconds_total = 0.0
+
+    async def _run(self, timer, fn, *args):
+        if self._in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise PasswordPoolFull()
+        self._in_flight += 1
+        submitted = time.perf_counter()
+        started = 0.0
+
+        def timed():
+            nonlocal started
+            started = time.perf_counter()
+            return fn(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            finished = time.perf_counter()
+            self._in_flight -= 1
+            if started:
+                queued = started - submitted
+                self.completed += 1
+                self.queue_seconds_total += queued
+                self.queue_seconds_max = max(self.queue_seconds_max, queued)
+                self.work_seconds_total += finished - started
+                timer.observe(finished - started)
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)).decode('utf-8')
+
+    async def hash(self, password: str) -> str:
+        return await self._run(BCRYPT_HASH_TIMER, self._hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(BCRYPT_VERIFY_TIMER, bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when a stored "$2b$<cost>$..." hash uses a different cost than configured."""
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    async def rehash_if_needed(self, password: str, password_hash: str) -> str | None:
+        """
+        A new hash of a just-verified password when password_hash was made
+        with a different cost, for the caller to store; None when it is
+        current or the pool is too busy (the upgrade waits for a later login).
+        """
+        if not self.needs_rehash(password_hash):
+            return None
+        try:
+            new_hash = await self.hash(password)
+        except PasswordPoolFull:
+            return None
+        self.rehashed += 1
+        return new_hash
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "rounds": self.rounds,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "queue_seconds_avg": self.queue_seconds_total / self.completed if self.completed else 0.0,
+            "queue_seconds_max": self.queue_seconds_max,
+            "work_seconds_avg": self.work_seconds_total / self.completed if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,400 @@
+import asyncio
+import errno
+import fcntl
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it only originals are stored
+    Image = None
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+# Bytes needed to recognise every supported format
+SNIFF_BYTES = 12
+
+# Stored files hash into this many fcntl byte-range locks (see PhotoStore._locked)
+LOCK_BUCKETS = 4096
+LOCK_POLL_SECONDS = 0.005
+
+# Resized variants generated next to each original (longest side in pixels)
+PHOTO_VARIANTS = {"thumb": 128, "medium": 512}
+
+# Content-addressed files never change, so clients may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MEDIA_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+PIL_FORMATS = {".jpg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+# <aa>/<bb>/<sha256>[_<variant>].<ext>
+_STORED_NAME = re.compile(r"^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(?:_([a-z]+))?(\.(?:jpg|png|webp))$")
+# <uuid4>.<ext>, written before photos were content-addressed
+_LEGACY_NAME = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.(?:jpg|png|webp)$")
+
+
+class PhotoRejected(Exception):
+    """Base class for uploads that fail validation; `detail` is user-facing."""
+
+    detail = "Invalid image upload."
+
+
+class PhotoEmpty(PhotoRejected):
+    detail = "Uploaded file is empty."
+
+
+class PhotoTooLarge(PhotoRejected):
+    detail = "Image is too large. Maximum allowed size is 5MB."
+
+
+class PhotoTypeUnsupported(PhotoRejected):
+    detail = "Unsupported file type. Please upload a JPG, PNG, or WEBP image."
+
+
+class StoredPhoto(NamedTuple):
+    url: str
+    variants: dict[str, str]
+    deduplicated: bool
+
+
+class PhotoFile(NamedTuple):
+    """A file resolved from an /uploads/ path, ready to be served."""
+    path: Path
+    media_type: str
+    etag: str | None
+    immutable: bool
+
+
+def sniff_image_type(header: bytes) -> str | None:
+    """Content type from the file's magic bytes, or None if it is not a supported image."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _open_temp(directory: Path):
+    fd, name = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    os.fchmod(fd, 0o644)
+    return os.fdopen(fd, "wb"), Path(name)
+
+
+def remove_file(path: Path) -> None:
+    """Best-effort delete."""
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def _publish(tmp_path: Path, final_path: Path) -> bool:
+    """Moves a finished upload into place; returns True if the bytes were already stored."""
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    if final_path.exists():
+        tmp_path.unlink()
+        return True
+    os.replace(tmp_path, final_path)
+    return False
+
+
+def make_variants(original: str, extension: str, sizes: dict[str, int]) -> dict[str, str]:
+    """
+    Process pool worker: writes a downscaled copy of `original` per size and
+    returns {variant: file name}. Sizes the image is already within are
+    skipped (the original serves them), as are variants that already exist.
+    """
+    source = Path(original)
+    stem = source.name[:-len(extension)]
+    made = {}
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        for name, size in sizes.items():
+            if max(image.size) <= size:
+                continue
+            target = source.with_name(f"{stem}_{name}{extension}")
+            if not target.exists():
+                variant = image.copy()
+                variant.thumbnail((size, size))
+                if extension == ".jpg" and variant.mode not in ("RGB", "L"):
+                    variant = variant.convert("RGB")
+                out, tmp_path = _open_temp(source.parent)
+                with out:
+                    variant.save(out, format=PIL_FORMATS[extension])
+                os.replace(tmp_path, target)
+            made[name] = target.name
+    return made
+
+
+class PhotoStore:
+    """
+    Content-addressed profile photo storage under `root`.
+
+    Files are named by the SHA-256 of their bytes and sharded two levels deep
+    (uploads/ab/cd/abcd....jpg), so identical uploads share one file and a URL
+    always refers to the same bytes. Resized variants are generated in a
+    process pool when Pillow is installed.
+
+    Because files are shared, linking a user to a file and deleting a file
+    that no user links to any more must not interleave: save() holds the
+    file's lock until the caller has stored the URL, and release() holds it
+    from the reference check to the unlink.
+    """
+
+    def __init__(self, root: Path, url_prefix: str = "/uploads", workers: int = 1):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.workers = workers
+        self._executor = None
+        self._lock_fd = None
+        self._bucket_locks = {}
+        self.stored = 0
+        self.deduplicated = 0
+        self.released = 0
+        self.variant_failures = 0
+
+    @property
+    def variants_enabled(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the parent runs threads (bcrypt pool, Mongo driver)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _url(self, path: Path) -> str:
+        return f"{self.url_prefix}/{path.relative_to(self.root).as_posix()}"
+
+    @asynccontextmanager
+    async def _locked(self, path: Path) -> AsyncIterator[None]:
+        """
+        Exclusive hold on a stored file (and its variants) across every
+        worker on the host: an fcntl byte-range lock on the file's bucket in
+        uploads/.photo-locks, plus a process-local lock per bucket, since
+        fcntl locks do not exclude callers in the same process. The fcntl
+        lock is polled rather than waited on in a thread, so a cancelled
+        request cannot leave it held.
+        """
+        bucket = zlib.crc32(path.name.encode()) % LOCK_BUCKETS
+        lock = self._bucket_locks.setdefault(bucket, asyncio.Lock())
+        async with lock:
+            if self._lock_fd is None:
+                self._lock_fd = os.open(self.root / ".photo-locks", os.O_RDWR | os.O_CREAT, 0o600)
+            fd = self._lock_fd
+            while True:
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, bucket)
+                    break
+                except OSError as exc:
+                    if exc.errno not in (errno.EACCES, errno.EAGAIN):
+                        raise
+                    await asyncio.sleep(LOCK_POLL_SECONDS)
+            try:
+                yield
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, bucket)
+
+    @asynccontextmanager
+    async def save(
+        self,
+        file: UploadFile,
+        extensions: dict[str, str],
+        max_bytes: int,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+    ) -> AsyncIterator[StoredPhoto]:
+        """
+        Streams an upload into the store; use as `async with store.save(...)
+        as photo:` and point the user at photo.url inside the block. The
+        file's lock is held for the whole block, so release() cannot delete
+        the file (already stored by another upload of the same bytes) between
+        publishing it and the caller's write.
+
+        `file` has already been received: Starlette parses the multipart
+        body before the handler runs and spools the file part (in memory up
+        to 1 MB, then on disk). UploadLimitMiddleware is what bounds that.
+        This copies the spooled file into the store `chunk_size` bytes at a
+        time, so the store never holds the whole file, and enforces the exact
+        `max_bytes` on the file part. The type is taken from the magic bytes
+        (the client's content_type is not trusted). Disk I/O runs in the
+        threadpool: chunks go to a temp file that is renamed to its hash only
+        once the copy is complete.
+        """
+        header = b""
+        while len(header) < SNIFF_BYTES:
+            chunk = await file.read(SNIFF_BYTES - len(header))
+            if not chunk:
+                break
+            header += chunk
+        if not header:
+            raise PhotoEmpty()
+        content_type = sniff_image_type(header)
+        if content_type not in extensions:
+            raise PhotoTypeUnsupported()
+        extension = extensions[content_type]
+
+        digest = hashlib.sha256(header)
+        out, tmp_path = await run_in_threadpool(_open_temp, self.root)
+        try:
+            with out:
+                size = len(header)
+                await run_in_threadpool(out.write, header)
+                while chunk := await file.read(chunk_size):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise PhotoTooLarge()
+                    digest.update(chunk)
+                    await run_in_threadpool(out.write, chunk)
+        except BaseException:
+            await run_in_threadpool(remove_file, tmp_path)
+            raise
+
+        name = digest.hexdigest()
+        final_path = self.root / name[:2] / name[2:4] / f"{name}{extension}"
+        async with self._locked(final_path):
+            try:
+                deduplicated = await run_in_threadpool(_publish, tmp_path, final_path)
+            except BaseException:
+                await run_in_threadpool(remove_file, tmp_path)
+                raise
+
+            self.stored += 1
+            self.deduplicated += deduplicated
+            variants = {}
+            if self.variants_enabled:
+                try:
+                    made = await asyncio.get_running_loop().run_in_executor(
+                        self._pool(), make_variants, str(final_path), extension, PHOTO_VARIANTS)
+                except Exception:
+                    # Undecodable image or broken pool: serve the original for every variant
+                    self.variant_failures += 1
+                else:
+                    variants = {variant: self._url(final_path.with_name(filename)) for variant, filename in made.items()}
+            yield StoredPhoto(self._url(final_path), variants, deduplicated)
+
+    async def release(self, url: str, in_use: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Deletes the file behind `url` and its variants unless `in_use()` finds
+        a user still pointing at it; returns True if it was deleted. The check
+        and the unlink run under the file's lock, so a concurrent upload of
+        the same bytes either stores its URL first (and the file is kept) or
+        publishes a fresh copy after the delete.
+        """
+        paths = self.paths_for_url(url)
+        if not paths:
+            return False
+        async with self._locked(paths[0]):
+            if await in_use():
+                return False
+            for path in paths:
+                await run_in_threadpool(remove_file, path)
+        self.released += 1
+        return True
+
+    def resolve(self, file_path: str) -> PhotoFile | None:
+        """Maps the path after /uploads/ to a file, or None if it is not a stored photo name."""
+        match = _STORED_NAME.match(file_path)
+        if match:
+            _, _, digest, variant, extension = match.groups()
+            etag = f'"{digest}_{variant}"' if variant else f'"{digest}"'
+            return PhotoFile(self.root / file_path, MEDIA_TYPES[extension], etag, True)
+        if _LEGACY_NAME.match(file_path):
+            return PhotoFile(self.root / file_path, MEDIA_TYPES[file_path[-4:]], None, False)
+        return None
+
+    def paths_for_url(self, url: str) -> list[Path]:
+        """The original and every variant file behind a photo URL (empty if it is not ours)."""
+        prefix = self.url_prefix + "/"
+        if not url.startswith(prefix):
+            return []
+        photo = self.resolve(url[len(prefix):])
+        if photo is None:
+            return []
+        if not photo.immutable:
+            return [photo.path]
+        stem, extension = photo.path.name[:-len(photo.path.suffix)], photo.path.suffix
+        return [photo.path] + [photo.path.with_name(f"{stem}_{name}{extension}") for name in PHOTO_VARIANTS]
+
+    def stats(self) -> dict:
+        return {
+            "variants_enabled": self.variants_enabled,
+            "workers": self.workers,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "released": self.released,
+            "variant_failures": self.variant_failures,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+class UploadLimitMiddleware:
+    """
+    Caps the request body of the photo upload route before it is parsed.
+
+    Pure ASGI, like MetricsMiddleware. A declared Content-Length over
+    `max_bytes` (plus the multipart envelope) is rejected with 413 before any
+    of the body is read, and the bytes actually received are counted, so a
+    chunked or mislabelled upload is cut off as soon as it passes the limit
+    rather than after it has been spooled to disk. The 413 is raised from
+    the body stream, so the app's HTTPException handler formats it.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int):
+        self.app = app
+        self.path = path
+        self.limit = max_bytes + MULTIPART_OVERHEAD_BYTES
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=PhotoTooLarge.detail)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            if declared is not None and (not declared.isdigit() or int(declared) > self.limit):
+                raise self._too_large()
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def if_none_match(header: str | None, etag: str) -> bool:
+    """True when an If-None-Match header matches `etag` (weak comparison, per RFC 9110)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
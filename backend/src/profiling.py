@@ -0,0 +1,202 @@
+# Generated from shared/profiling.py by shared/vendor.py; edit that file, not this copy.
+"""
+Opt-in wall-clock profiler for single requests, shared by the backend and
+the heart-risk service (shared/vendor.py copies this file into each one).
+
+A request is profiled when it carries a valid signed X-Profile header or is
+picked at the configured sample rate. While it runs, a sampler thread
+records where the request's asyncio task is every interval: the live stack
+when the task is running, or the chain of awaits it is suspended in
+(database, threadpool, batcher...) when it is waiting. Finished profiles go
+to a bounded ring buffer and can be downloaded as collapsed stacks
+("frame;frame;frame count" lines) for flamegraph.pl, speedscope or similar.
+
+When neither a secret nor a sample rate is configured, the middleware is not
+installed at all.
+
+Sign a header valid for five minutes (the secret is the admin token):
+
+    python profiling.py "$ADMIN_TOKEN" 300     # backend: python -m src.profiling
+"""
+import asyncio
+import hashlib
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+PROFILE_HEADER = b"x-profile"
+WAITING_FRAME = "[awaiting]"
+
+
+def sign_profile_token(secret: str, ttl_seconds: float = 300) -> str:
+    """An X-Profile header value ("<expires>.<hmac>") valid for ttl_seconds."""
+    expires = str(int(time.time() + ttl_seconds))
+    signature = hmac.new(secret.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_profile_token(secret: str, token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not secret or not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    def __init__(self, profile_id: int, method: str, path: str, task: asyncio.Task, root_frame):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.stacks = Counter()
+        self._task = task
+        self._root_frame = root_frame
+
+    def sample(self, loop_frame) -> None:
+        """Records one sample; runs on the sampler thread."""
+        task, root_frame = self._task, self._root_frame
+        if task is None:
+            return  # finished since the sampler picked it up
+        stack = []
+        frame = loop_frame
+        while frame is not None and frame is not root_frame:
+            stack.append(frame)
+            frame = frame.f_back
+        if frame is root_frame:
+            # Our task holds the event loop right now
+            stack.append(frame)
+            labels = [_frame_label(f) for f in reversed(stack)]
+        else:
+            # Suspended: follow the awaits down from the middleware's coroutine
+            labels = []
+            coro = task.get_coro()
+            while coro is not None:
+                frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+                if frame is root_frame or labels:
+                    if frame is not None:
+                        labels.append(_frame_label(frame))
+                coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+            labels.append(WAITING_FRAME)
+        self.stacks[tuple(labels)] += 1
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_seconds": self.duration,
+            "samples": sum(self.stacks.values()),
+        }
+
+    def collapsed(self) -> str:
+        root = f"{self.method} {self.path} #{self.id}"
+        return "".join(f"{root};{';'.join(stack)} {count}\n" for stack, count in self.stacks.items())
+
+
+class Profiler:
+    """Sampler thread plus the ring buffer of finished request profiles."""
+
+    def __init__(self, secret: str = "", sample_rate: float = 0.0, interval_ms: float = 2.0, buffer_size: int = 50):
+        self.secret = secret or ""
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.profiles = deque(maxlen=buffer_size)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ids = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret) or self.sample_rate > 0
+
+    def should_profile(self, headers) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if self.secret:
+            for name, value in headers:
+                if name == PROFILE_HEADER:
+                    return verify_profile_token(self.secret, value.decode("latin-1"))
+        return False
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active.items())
+            frames = sys._current_frames()
+            for profile, thread_id in active:
+                profile.sample(frames.get(thread_id))
+
+    def begin(self, method: str, path: str, root_frame) -> RequestProfile:
+        """Starts sampling the current task from root_frame down."""
+        profile = RequestProfile(next(self._ids), method, path, asyncio.current_task(), root_frame)
+        with self._lock:
+            self._active[profile] = threading.get_ident()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def finish(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active.pop(profile, None)
+        profile.duration = time.time() - profile.started_at
+        # Keep only the counts; holding the frames would keep request locals alive
+        profile._task = profile._root_frame = None
+        self.profiles.append(profile)
+
+    def get(self, profile_id: int):
+        return next((p for p in self.profiles if p.id == profile_id), None)
+
+    def collapsed(self) -> str:
+        return "".join(profile.collapsed() for profile in list(self.profiles))
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware; only add it when profiler.enabled."""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.should_profile(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.begin(scope["method"], scope["path"], sys._getframe())
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.profiler.finish(profile)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise SystemExit("usage: python profiling.py SECRET [TTL_SECONDS]")
+    print(sign_profile_token(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 300))
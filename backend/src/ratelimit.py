@@ -0,0 +1,141 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import parse_qs, urlparse
+
+from limits.storage import Storage
+
+# One slot per rate limit key: key hash, window end (epoch seconds), count
+SLOT = struct.Struct("<Qdq8x")
+SLOTS_PER_BUCKET = 8
+BUCKET = struct.Struct("<" + "Qdq8x" * SLOTS_PER_BUCKET)
+BUCKET_SIZE = BUCKET.size
+DEFAULT_BUCKETS = 4096  # 32768 keys in a 1 MiB file
+
+
+class SharedFileStorage(Storage):
+    """
+    Rate limit counters in a memory-mapped file shared by every worker on the
+    host, so "5 per minute" means five per minute for the whole server rather
+    than per uvicorn worker.
+
+        RATE_LIMIT_STORAGE_URI=sharedfile:///run/healthapp/ratelimit.bin?buckets=4096
+
+    Keys hash into fixed-size buckets of 8 slots; a full bucket evicts its
+    soonest-expiring key. Each update holds an fcntl byte-range lock on just
+    its bucket (plus a process-local lock, since fcntl locks do not exclude
+    threads of the same process), so workers only contend on the same key
+    neighbourhood and nothing runs through a server process.
+
+    Implements the counter contract of the fixed-window strategy (slowapi's
+    default): each key gets `limit` hits that refill when its window ends.
+    """
+
+    STORAGE_SCHEME = ["sharedfile"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        parsed = urlparse(uri)
+        if not parsed.path:
+            raise ValueError(f"sharedfile:// storage needs a file path: {uri!r}")
+        query = parse_qs(parsed.query)
+        self.path = parsed.path
+        self.buckets = int(query.get("buckets", [DEFAULT_BUCKETS])[0])
+        size = self.buckets * BUCKET_SIZE
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_lock = threading.Lock()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _hash(key: str) -> int:
+        # Never 0, which marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") | 1
+
+    def _find(self, offset: int, key_hash: int, now: float):
+        """Returns (position, expires, count) of the key's live slot, or (free position, 0.0, 0)."""
+        slots = BUCKET.unpack_from(self._map, offset)
+        reusable = 0
+        reusable_expires = float("inf")
+        for i in range(0, 3 * SLOTS_PER_BUCKET, 3):
+            slot_hash, expires = slots[i], slots[i + 1]
+            if slot_hash == key_hash:
+                if expires > now:
+                    return offset + i // 3 * SLOT.size, expires, slots[i + 2]
+                return offset + i // 3 * SLOT.size, 0.0, 0
+            # Prefer empty/expired slots, else evict the one expiring soonest
+            if slot_hash == 0 or expires <= now:
+                expires = 0.0
+            if expires < reusable_expires:
+                reusable, reusable_expires = i, expires
+        return offset + reusable // 3 * SLOT.size, 0.0, 0
+
+    def incr(self, key: str, expiry: float, amount: int = 1, elastic_expiry: bool = False) -> int:
+        # elastic_expiry is only passed by limits 4.x (fixed-window-elastic-expiry)
+        key_hash = self._hash(key)
+        offset = key_hash % self.buckets * BUCKET_SIZE
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, BUCKET_SIZE, offset)
+            try:
+                now = time.time()
+                pos, expires, count = self._find(offset, key_hash, now)
+                count += amount
+                if elastic_expiry or not expires:
+                    expires = now + expiry
+                SLOT.pack_into(self._map, pos, key_hash, expires, count)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, BUCKET_SIZE, offset)
+        return count
+
+    def _read(self, key: str):
+        key_hash = self._hash(key)
+        offset = key_hash % self.buckets * BUCKET_SIZE
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_SH, BUCKET_SIZE, offset)
+            try:
+                return self._find(offset, key_hash, time.time())
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, BUCKET_SIZE, offset)
+
+    def get(self, key: str) -> int:
+        return self._read(key)[2]
+
+    def get_expiry(self, key: str) -> float:
+        return self._read(key)[1] or time.time()
+
+    def clear(self, key: str) -> None:
+        key_hash = self._hash(key)
+        offset = key_hash % self.buckets * BUCKET_SIZE
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, BUCKET_SIZE, offset)
+            try:
+                pos, expires, _ = self._find(offset, key_hash, time.time())
+                if expires:
+                    SLOT.pack_into(self._map, pos, 0, 0.0, 0)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, BUCKET_SIZE, offset)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def reset(self) -> int | None:
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                cleared = sum(1 for slot_hash, _, _ in SLOT.iter_unpack(self._map) if slot_hash)
+                self._map[:] = bytes(len(self._map))
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        return cleared
@@ -0,0 +1,86 @@
+"""
+JSON responses for the API.
+
+FastJSONResponse is the app's default response class: it encodes with orjson
+when it is installed and falls back to Starlette's json.dumps otherwise. The
+output is the same compact JSON either way.
+
+Routes return their envelope already encoded, so FastAPI skips its
+response_model pass (dumping the returned SuccessResponse, validating it
+again as SuccessResponse[...], then encoding); response_model= stays on the
+routes for the OpenAPI schema.
+
+- user_response / auth_response: the User and SignupResponse envelopes. A
+  User was validated when it was loaded or created, and UserResponse is a
+  subset of its fields in the same order, so the User is serialized with its
+  own schema restricted to those fields. Nothing is validated a second time.
+- success_response: any other data model, validated once into a cached
+  SuccessResponse[model] adapter and encoded by pydantic-core.
+- error_response: the {"success": false, "error": ...} body.
+"""
+from functools import lru_cache
+from typing import Any, Mapping
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from .models import ErrorDetail, ErrorResponse, SuccessResponse, TokenResponse, User, UserResponse
+
+try:
+    import orjson
+except ImportError:  # optional; Starlette's encoder is used instead
+    orjson = None
+
+USER_RESPONSE_FIELDS = frozenset(UserResponse.model_fields)
+
+_USER = TypeAdapter(User)
+_TOKENS = TypeAdapter(TokenResponse)
+_ERROR = TypeAdapter(ErrorResponse)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class EncodedJSONResponse(JSONResponse):
+    """A JSON response whose body is already encoded."""
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def user_json(user: User) -> bytes:
+    """The UserResponse JSON for a User."""
+    return _USER.dump_json(user, include=USER_RESPONSE_FIELDS)
+
+
+def user_response(user: User) -> EncodedJSONResponse:
+    """SuccessResponse[UserResponse]."""
+    return EncodedJSONResponse(b'{"success":true,"data":' + user_json(user) + b'}')
+
+
+def auth_response(user: User, access_token: str, refresh_token: str) -> EncodedJSONResponse:
+    """SuccessResponse[SignupResponse], as returned by signup and login."""
+    tokens = _TOKENS.dump_json(TokenResponse(access_token=access_token, refresh_token=refresh_token))
+    return EncodedJSONResponse(b'{"success":true,"data":{"user":' + user_json(user) + b',"tokens":' + tokens + b'}}')
+
+
+@lru_cache(maxsize=None)
+def envelope_adapter(model: type[BaseModel]) -> TypeAdapter:
+    """Validator and serializer for SuccessResponse[model], built once per model."""
+    return TypeAdapter(SuccessResponse[model])
+
+
+def success_response(model: type[BaseModel], data: Any, status_code: int = 200) -> EncodedJSONResponse:
+    """{"success": true, "data": ...} with data validated as `model` and encoded in one pass."""
+    adapter = envelope_adapter(model)
+    envelope = adapter.validate_python({"success": True, "data": data}, from_attributes=True)
+    return EncodedJSONResponse(adapter.dump_json(envelope), status_code=status_code)
+
+
+def error_response(status_code: int, error: ErrorDetail, headers: Mapping[str, str] | None = None) -> EncodedJSONResponse:
+    body = _ERROR.dump_json(ErrorResponse(error=error))
+    return EncodedJSONResponse(body, status_code=status_code, headers=headers)
@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+
+from .models import User
+
+
+class UserCache:
+    """
+    Bounded LRU + TTL cache of User documents keyed by user id, used by
+    get_current_user to skip the Mongo lookup on every authenticated request.
+
+    - Entries expire ttl_seconds after they were fetched, so a change made by
+      another worker is visible after at most one TTL.
+    - Writes in this process call invalidate(). Every invalidation bumps an
+      epoch, and put() drops documents fetched before the latest epoch, so a
+      read racing a write cannot re-insert the old version. put() also never
+      replaces an entry with one whose updated_at is older.
+    - Callers get their own copy of the document, so mutating it never leaks
+      into the cache. A cached copy can still be stale, so handlers write
+      with a partial $set of the fields they change (never save()) and then
+      invalidate().
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl_seconds: float = 30.0, enabled: bool = True):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and max_size > 0 and ttl_seconds > 0
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def epoch(self) -> int:
+        """Read before fetching from the database and pass to put()."""
+        return self._epoch
+
+    def get(self, user_id: str) -> User | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        fetched_at, user = entry
+        if time.monotonic() - fetched_at > self.ttl_seconds:
+            del self._entries[user_id]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user.model_copy()
+
+    def put(self, user_id: str, user: User, epoch: int) -> None:
+        if not self.enabled or epoch != self._epoch:
+            return
+        current = self._entries.get(user_id)
+        if current is not None and current[1].updated_at > user.updated_at:
+            return
+        self._entries[user_id] = (time.monotonic(), user.model_copy())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        self._epoch += 1
+        self.invalidations += 1
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
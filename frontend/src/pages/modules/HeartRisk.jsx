@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { useTranslation } from 'react-i18next';
-import axios from 'axios';
+import apiClient from '../../api/client';
 import PageShell from '../../components/PageShell';
 
 const HeartRisk = () => {
@@ -21,9 +21,6 @@ const HeartRisk = () => {
   const [result, setResult] = useState(null);
   const [error, setError] = useState(null);
 
-  // ML API endpoint - adjust this URL based on where your ML backend is running
-  const ML_API_URL = import.meta.env.VITE_ML_API_URL || 'http://localhost:8001/predict';
-
   const handleChange = (name, value) => {
     setFormData(prev => ({ ...prev, [name]: value }));
     setError(null);
@@ -43,7 +40,7 @@ const HeartRisk = () => {
     setResult(null);
 
     try {
-      // Prepare data for ML API (matching the expected format)
+      // Same fields as the ML service's /predict; the backend forwards them
       const payload = {
         Age: parseFloat(formData.Age) || 0,
         Gender: formData.Gender === 'male' ? 1 : 0,
@@ -57,14 +54,11 @@ const HeartRisk = () => {
         Cold_Sweats_Nausea: mapValueToInt(formData.Cold_Sweats_Nausea),
       };
 
-      const response = await axios.post(ML_API_URL, payload, {
-        headers: { 'Content-Type': 'application/json' },
-        timeout: 10000,
-      });
+      const prediction = await apiClient.post('/heart-risk/predict', payload);
 
-      setResult(response.data);
+      setResult(prediction);
     } catch (err) {
-      setError(err.response?.data?.detail || err.message || 'Failed to get prediction. Please ensure the ML backend is running.');
+      setError(err.message || 'Failed to get prediction. Please try again shortly.');
     } finally {
       setIsSubmitting(false);
     }
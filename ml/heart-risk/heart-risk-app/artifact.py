@@ -0,0 +1,156 @@
+"""
+Memory-mappable model artifacts for the compiled inference engines.
+
+train_model.py publishes each compiled model as a versioned directory of
+plain .npy arrays plus a manifest.json, under an artifact root:
+
+    model_artifacts/
+        CURRENT                  <- name of the live version, replaced atomically
+        <version>/manifest.json  <- kind, feature columns, per-array sha256
+        <version>/<array>.npy
+
+The service opens the arrays with np.load(mmap_mode="r"), so loading takes
+milliseconds and every worker on a host shares the same page-cache pages.
+The version is a hash of the arrays, so an unchanged model republishes to the
+same directory.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+from inference import ForestModel, LinearModel
+
+ARTIFACT_FORMAT_VERSION = 1
+CURRENT_FILENAME = "CURRENT"
+MANIFEST_FILENAME = "manifest.json"
+# Older versions kept next to the live one, for workers still mapping them
+KEEP_VERSIONS = 3
+
+
+def _engine_arrays(engine: Any) -> Dict[str, np.ndarray]:
+    if isinstance(engine, LinearModel):
+        return {"coef": engine.coef, "intercept": np.array([engine.intercept])}
+    if isinstance(engine, ForestModel):
+        return {
+            "roots": engine.roots,
+            "feature": engine.feature,
+            "threshold": engine.threshold,
+            "left": engine.left,
+            "right": engine.right,
+            "leaf_value": engine.leaf_value,
+            "max_depth": np.array([engine.max_depth]),
+        }
+    raise TypeError(f"No artifact format for {type(engine).__name__} engines")
+
+
+def _engine_from_arrays(kind: str, arrays: Dict[str, np.ndarray]) -> Any:
+    if kind == LinearModel.kind:
+        return LinearModel(arrays["coef"], arrays["intercept"][0])
+    if kind == ForestModel.kind:
+        return ForestModel(
+            roots=arrays["roots"],
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            leaf_value=arrays["leaf_value"],
+            max_depth=arrays["max_depth"][0],
+        )
+    raise ValueError(f"Unknown artifact kind {kind!r}")
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def current_version(root: str) -> str:
+    """Returns the live version name, or raises FileNotFoundError."""
+    with open(os.path.join(root, CURRENT_FILENAME)) as f:
+        return f.read().strip()
+
+
+def save_artifact(engine: Any, root: str, feature_columns: Sequence[str]) -> str:
+    """Writes engine as a new artifact version, points CURRENT at it and returns the version."""
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=root)
+    try:
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "kind": engine.kind,
+            "feature_columns": list(feature_columns),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "arrays": {},
+        }
+        version_hash = hashlib.sha256(engine.kind.encode())
+        for name, array in _engine_arrays(engine).items():
+            filename = f"{name}.npy"
+            np.save(os.path.join(staging, filename), np.ascontiguousarray(array))
+            sha = _sha256(os.path.join(staging, filename))
+            manifest["arrays"][name] = {"file": filename, "sha256": sha}
+            version_hash.update(f"{name}:{sha}".encode())
+
+        version = version_hash.hexdigest()[:16]
+        manifest["version"] = version
+        with open(os.path.join(staging, MANIFEST_FILENAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        target = os.path.join(root, version)
+        if os.path.isdir(target):
+            shutil.rmtree(staging)
+        else:
+            os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(root, f".{CURRENT_FILENAME}.tmp")
+    with open(pointer, "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer, os.path.join(root, CURRENT_FILENAME))
+    _prune_versions(root, keep=version)
+    return version
+
+
+def _prune_versions(root: str, keep: str) -> None:
+    versions = [
+        entry for entry in os.scandir(root)
+        if entry.is_dir() and not entry.name.startswith(".") and entry.name != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def load_artifact(root: str, feature_columns: Sequence[str]) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Memory-maps the live artifact version and returns (engine, manifest).
+    Raises FileNotFoundError if there is none, or ValueError if the manifest
+    does not match the service or the array hashes.
+    """
+    version = current_version(root)
+    directory = os.path.join(root, version)
+    with open(os.path.join(directory, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format_version')!r}")
+    if manifest["feature_columns"] != list(feature_columns):
+        raise ValueError(f"Artifact {version} was trained on different feature columns")
+
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        path = os.path.join(directory, entry["file"])
+        if _sha256(path) != entry["sha256"]:
+            raise ValueError(f"Artifact {version} array {name!r} does not match its manifest hash")
+        arrays[name] = np.load(path, mmap_mode="r")
+    return _engine_from_arrays(manifest["kind"], arrays), manifest
@@ -0,0 +1,261 @@
+"""
+Offline benchmark suite for the heart-risk serving path.
+
+Runs entirely in-process with seeded synthetic HeartRiskInput records (no
+network, no dataset) and measures:
+
+- model load time and process RSS,
+- generate_personalized_tips and the raw scoring path per call, with and
+  without explanations (whose contributions are checked to add up first),
+- single /predict, /predict/batch and concurrent /predict requests through
+  the ASGI app.
+
+Results are written as JSON. Pass --baseline to compare against an earlier
+run; any metric that is more than --threshold worse exits with status 1.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+from inference import verify_contributions
+
+# Metrics where a larger value is better; everything else is a cost
+HIGHER_IS_BETTER = ("throughput",)
+
+
+def synthetic_inputs(n, feature_columns, seed=0):
+    """Random HeartRiskInput-shaped dicts: 0/1 flags, integer and fractional ages."""
+    rng = np.random.default_rng(seed)
+    flags = rng.integers(0, 2, size=(n, len(feature_columns)))
+    ages = np.where(rng.random(n) < 0.8, rng.integers(18, 101, n), rng.uniform(18, 100, n).round(1))
+    records = []
+    for row, age in zip(flags.tolist(), ages.tolist()):
+        record = dict(zip(feature_columns, row))
+        record["Age"] = age
+        records.append(record)
+    return records
+
+
+def rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def summarize(samples, items_per_sample=1):
+    """Latency percentiles in microseconds and throughput in items/second."""
+    samples = np.asarray(samples)
+    return {
+        "n": int(samples.size),
+        "p50_us": float(np.percentile(samples, 50) * 1e6),
+        "p99_us": float(np.percentile(samples, 99) * 1e6),
+        "mean_us": float(samples.mean() * 1e6),
+        "throughput": float(items_per_sample * samples.size / samples.sum()),
+    }
+
+
+def time_calls(fn, args_list, warmup=50):
+    for args in args_list[:warmup]:
+        fn(*args)
+    gc.collect()
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def asgi_request(app, method, path, body=b"", content_type="application/json"):
+    """Calls an ASGI app directly and returns (status, body)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(b"host", b"bench"), (b"content-type", content_type.encode()),
+                    (b"content-length", str(len(body)).encode())],
+    }
+    request_sent = False
+    status = None
+    chunks = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+async def bench_asgi(service, records, batch_size, concurrency):
+    results = {}
+    bodies = [json.dumps(record).encode() for record in records]
+
+    async def timed(path, body):
+        started = time.perf_counter()
+        status, _ = await asgi_request(service.app, "POST", path, body)
+        if status != 200:
+            raise RuntimeError(f"{path} returned {status}")
+        return time.perf_counter() - started
+
+    async with service.lifespan(service.app):
+        for body in bodies[:50]:
+            await timed("/predict", body)
+        results["asgi_predict_single"] = summarize([await timed("/predict", body) for body in bodies])
+
+        batches = [
+            ("[" + ",".join(json.dumps(r) for r in records[i:i + batch_size]) + "]").encode()
+            for i in range(0, len(records) - batch_size + 1, batch_size)
+        ]
+        results["asgi_predict_batch"] = summarize([await timed("/predict/batch", body) for body in batches], batch_size)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(body):
+            async with semaphore:
+                return await timed("/predict", body)
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(limited(body) for body in bodies))
+        wall = time.perf_counter() - started
+        results["asgi_predict_concurrent"] = {**summarize(samples), "throughput": len(bodies) / wall,
+                                              "concurrency": concurrency}
+    return results
+
+
+def run(args):
+    results = {"meta": {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }}
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    import main as service
+    results["import_seconds"] = time.perf_counter() - started
+    results["rss_after_import_mb"] = rss_mb()
+    results["rss_import_delta_mb"] = results["rss_after_import_mb"] - rss_before
+    if service.model is None:
+        raise SystemExit("No model found; run train_model.py first.")
+
+    results["meta"]["model_version"] = service.model.version
+    results["meta"]["engine"] = service.model.engine.kind
+    results["model_load"] = summarize(time_calls(service.load_model, [()] * 10, warmup=1))
+
+    records = synthetic_inputs(args.requests, service.MODEL_FEATURE_COLUMNS, args.seed)
+    rows = [[record[feature] for feature in service.MODEL_FEATURE_COLUMNS] for record in records]
+    levels = service.RISK_LEVELS * (len(rows) // len(service.RISK_LEVELS) + 1)
+
+    results["tips"] = summarize(time_calls(service.generate_personalized_tips, list(zip(rows, levels))))
+    current = service.model
+    results["score_single"] = summarize(time_calls(
+        service.render_predictions, [(current, np.array([row], dtype=np.float64)) for row in rows]))
+    X = np.array(rows, dtype=np.float64)
+    batches = [(current, X[i:i + args.batch_size]) for i in range(0, len(X) - args.batch_size + 1, args.batch_size)]
+    results["score_batch"] = summarize(time_calls(service.render_predictions, batches, warmup=2), args.batch_size)
+    if current.engine.explanation_scale is not None:
+        verify_contributions(current.engine, X)
+        results["score_single_explain"] = summarize(time_calls(
+            service.render_predictions, [(current, np.array([row], dtype=np.float64), False, True) for row in rows]))
+        results["score_batch_explain"] = summarize(time_calls(
+            service.render_predictions, [(current, batch, False, True) for (_, batch) in batches], warmup=2),
+            args.batch_size)
+
+    results.update(asyncio.run(bench_asgi(service, records, args.batch_size, args.concurrency)))
+    results["rss_final_mb"] = rss_mb()
+    return results
+
+
+def _flatten(results, prefix=""):
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, name + ".")
+        elif isinstance(value, (int, float)) and key not in ("n", "concurrency"):
+            yield name, float(value)
+
+
+def compare(results, baseline, threshold):
+    """Returns (rows, regressions) comparing every numeric metric to the baseline."""
+    current = dict(_flatten(results))
+    rows, regressions = [], []
+    for name, old in _flatten(baseline):
+        if name not in current or old == 0:
+            continue
+        new = current[name]
+        higher_is_better = name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER
+        change = (new - old) / abs(old)
+        worse = -change if higher_is_better else change
+        rows.append((name, old, new, change))
+        if worse > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the heart-risk serving path.")
+    parser.add_argument("--requests", type=int, default=2000, help="Synthetic requests per scenario")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed relative regression per metric (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    results = run(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name, value in _flatten(results):
+        print(f"{name:<40} {value:>14.2f}")
+    print(f"✅ Saved benchmark results to {args.output}.")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.threshold)
+        print(f"\n--- Compared with {args.baseline} (threshold {args.threshold:.0%}) ---")
+        for name, old, new, change in rows:
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"{name:<40} {old:>14.2f} -> {new:>14.2f} ({change:+.1%}){flag}")
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed beyond {args.threshold:.0%}.")
+            sys.exit(1)
+        print("✅ No regressions.")
+
+
+if __name__ == "__main__":
+    main()
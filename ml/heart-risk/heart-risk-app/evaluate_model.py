@@ -1,3 +1,5 @@
+import argparse
+
 import pandas as pd
 import joblib
 import numpy as np
@@ -5,6 +7,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, roc_curve, auc, classification_report, confusion_matrix
 import matplotlib.pyplot as plt
 
+from streaming import CHUNK_SIZE, StreamingBinaryMetrics, iter_chunks, test_mask
+
 # --- 1. Define the 10 Features (Must match train_model.py) ---
 MODEL_FEATURE_COLUMNS = [
     'Age', 'Gender', 'High_BP', 'High_Cholesterol',
@@ -12,54 +16,96 @@ MODEL_FEATURE_COLUMNS = [
     'Shortness_of_Breath', 'Pain_Arms_Jaw_Back', 'Cold_Sweats_Nausea'
 ]
 TARGET_COLUMN = 'Heart_Risk'
+TARGET_NAMES = ['No Risk (0)', 'High Risk (1)']
+DATA_FILENAME = "heart_risk.csv"
+
+
+def evaluate_in_memory(model):
+    """Loads the whole CSV and evaluates on the train_test_split test set."""
+    df = pd.read_csv(DATA_FILENAME)
+
+    # Select only the 10 features the model was trained on
+    X = df[MODEL_FEATURE_COLUMNS]
+    y = df[TARGET_COLUMN]
+
+    # --- 3. Prepare Test Data (Must match the split ratio from training) ---
+    # NOTE: Using the same test_size=0.2 and random_state=42 as in train_model.py
+    X_train_val, X_test, y_train_val, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    # --- 4. Evaluate Model Performance ---
+    y_pred = model.predict(X_test)
+    y_proba = model.predict_proba(X_test)[:, 1]
+
+    # Print key metrics
+    print("\n--- Model Evaluation Report (on 20% Test Data) ---")
+    print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred, target_names=TARGET_NAMES))
+    print("\nConfusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+
+    fpr, tpr, thresholds = roc_curve(y_test, y_proba)
+    return fpr, tpr, auc(fpr, tpr)
+
+
+def evaluate_streaming(model, chunk_size):
+    """
+    Streams the CSV in chunks and evaluates on the hash-based test split used
+    by train_model.py --stream, keeping only bounded-size histograms.
+    """
+    metrics = StreamingBinaryMetrics()
+    for start, chunk in iter_chunks(DATA_FILENAME, MODEL_FEATURE_COLUMNS, TARGET_COLUMN, chunk_size):
+        test = chunk[test_mask(start, len(chunk))]
+        if not test.empty:
+            metrics.update(test[TARGET_COLUMN], model.predict_proba(test[MODEL_FEATURE_COLUMNS])[:, 1])
+
+    print("\n--- Model Evaluation Report (streaming, on hash-split 20% Test Data) ---")
+    print(f"Accuracy: {metrics.accuracy():.4f}")
+    print("\nClassification Report:")
+    print(metrics.classification_report(TARGET_NAMES))
+    print("\nConfusion Matrix:")
+    print(metrics.confusion)
+
+    fpr, tpr = metrics.roc_curve()
+    return fpr, tpr, metrics.auc()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate heart_model.pkl on the test split.")
+    parser.add_argument("--stream", action="store_true", help="Evaluate out-of-core in bounded memory")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per chunk in --stream mode")
+    args = parser.parse_args()
+
+    # --- 2. Load Data and Model ---
+    try:
+        # Load the trained model
+        model = joblib.load("heart_model.pkl")
+        if args.stream:
+            fpr, tpr, roc_auc = evaluate_streaming(model, args.chunk_size)
+        else:
+            fpr, tpr, roc_auc = evaluate_in_memory(model)
+    except FileNotFoundError as e:
+        print(f"Error: Required file not found: {e}")
+        exit()
+    print(f"\nROC AUC: {roc_auc:.4f}")
+
+    # --- 5. Plot ROC Curve (as requested in original project file) ---
+    plt.figure()
+    plt.plot(fpr, tpr, color='darkorange', lw=2, label=f'ROC curve (area = {roc_auc:.4f})')
+    plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--')
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.05])
+    plt.xlabel('False Positive Rate')
+    plt.ylabel('True Positive Rate')
+    plt.title('Receiver Operating Characteristic (ROC) Curve')
+    plt.legend(loc="lower right")
+    plt.savefig('roc_curve.png')
+    plt.close()
+
+    print("✅ Saved ROC curve to roc_curve.png")
+
 
-# --- 2. Load Data and Model ---
-try:
-    # Load the trained model
-    model = joblib.load("heart_model.pkl")
-    # Load the dataset
-    df = pd.read_csv("heart_risk.csv")
-except FileNotFoundError as e:
-    print(f"Error: Required file not found: {e}")
-    exit()
-
-# Select only the 10 features the model was trained on
-X = df[MODEL_FEATURE_COLUMNS]
-y = df[TARGET_COLUMN]
-
-# --- 3. Prepare Test Data (Must match the split ratio from training) ---
-# NOTE: Using the same test_size=0.2 and random_state=42 as in train_model.py
-X_train_val, X_test, y_train_val, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-
-# --- 4. Evaluate Model Performance ---
-y_pred = model.predict(X_test)
-y_proba = model.predict_proba(X_test)[:, 1]
-
-# Print key metrics
-print("\n--- Model Evaluation Report (on 20% Test Data) ---")
-print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred, target_names=['No Risk (0)', 'High Risk (1)']))
-print("\nConfusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
-
-
-# --- 5. Plot ROC Curve (as requested in original project file) ---
-fpr, tpr, thresholds = roc_curve(y_test, y_proba)
-roc_auc = auc(fpr, tpr)
-
-plt.figure()
-plt.plot(fpr, tpr, color='darkorange', lw=2, label=f'ROC curve (area = {roc_auc:.4f})')
-plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--')
-plt.xlim([0.0, 1.0])
-plt.ylim([0.0, 1.05])
-plt.xlabel('False Positive Rate')
-plt.ylabel('True Positive Rate')
-plt.title('Receiver Operating Characteristic (ROC) Curve')
-plt.legend(loc="lower right")
-plt.savefig('roc_curve.png')
-plt.close()
-
-print("✅ Saved ROC curve to roc_curve.png")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Compiled, pandas-free inference for the models saved by train_model.py.
+
+compile_model() turns a fitted scikit-learn estimator into a small object
+exposing predict_proba(X) -> P(risk) over a float64 NumPy matrix whose
+columns follow MODEL_FEATURE_COLUMNS:
+
+- LogisticRegression is reduced to a dot-product kernel over coef_/intercept_.
+- RandomForestClassifier has every tree flattened into one set of contiguous
+  node arrays, which are walked for all rows and all trees at once.
+
+Anything else falls back to the estimator's own predict_proba.
+
+LookupTableModel wraps any of these with an exhaustive table over the
+discrete input space (integer Age x the nine 0/1 flags), so in-range
+requests become a single array read.
+
+The compiled engines also explain their predictions with contributions(X),
+which returns (base_value, (n, n_features) contributions) such that
+base_value + contributions.sum(axis=1) gives the prediction back exactly, on
+the engine's explanation_scale:
+
+- linear: "log_odds", coef * x per feature, with the intercept as the base.
+- forest: "probability", tree-path (Saabas) contributions. Every change in
+  node value along a row's path is credited to the feature split on, and
+  the result is averaged over trees, with the mean root value as the base.
+  The per-feature sum along every root-to-node path is precomputed once,
+  so explaining a row costs the same as scoring it.
+"""
+import numpy as np
+from typing import Any
+
+# Maximum absolute difference allowed between a compiled model and
+# clf.predict_proba before the compiled engine is rejected.
+PROBA_TOLERANCE = 1e-9
+
+# Integer ages covered by the precomputed lookup table (inclusive)
+LOOKUP_AGE_MIN = 0
+LOOKUP_AGE_MAX = 120
+
+
+class LinearModel:
+    """Binary logistic regression as sigmoid(X @ coef + intercept)."""
+
+    kind = "linear"
+    explanation_scale = "log_odds"
+
+    def __init__(self, coef: np.ndarray, intercept: float):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        z = self.decision_function(X)
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def contributions(self, X: np.ndarray):
+        return self.intercept, X * self.coef
+
+
+class ForestModel:
+    """
+    A random forest flattened into contiguous node arrays.
+
+    Node ids are global across trees; tree t starts at roots[t]. Leaves point
+    back to themselves so every (row, tree) walker can take max_depth steps
+    without branching on whether it has already reached a leaf.
+    """
+
+    kind = "forest"
+    explanation_scale = "probability"
+
+    def __init__(self, roots, feature, threshold, left, right, leaf_value, max_depth):
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.leaf_value = np.ascontiguousarray(leaf_value, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self._path_contributions = None
+
+    @classmethod
+    def from_estimators(cls, estimators) -> "ForestModel":
+        roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            counts = tree.value[:, 0, :]
+            proba = counts[:, 1] / counts.sum(axis=1)
+
+            roots.append(offset)
+            # Leaves compare feature 0 against +inf and loop back to themselves
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(proba)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            roots=np.array(roots),
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            leaf_value=np.concatenate(values),
+            max_depth=max_depth,
+        )
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Returns the (n_rows, n_trees) matrix of leaf node ids reached by X."""
+        # sklearn trees split on float32 features; round the same way.
+        X = X.astype(np.float32).astype(np.float64)
+        n_rows = X.shape[0]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        rows = np.arange(n_rows)[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.leaf_value[self.leaves(X)].mean(axis=1)
+
+    def path_contributions(self) -> np.ndarray:
+        """
+        (n_nodes, n_features) change in P(risk) from the tree's root to each
+        node, per feature split on along the way. Built on first use, one
+        tree level at a time (leaf_value holds every node's value).
+        """
+        if self._path_contributions is None:
+            n_features = int(self.feature.max()) + 1 if self.feature.size else 0
+            paths = np.zeros((len(self.feature), n_features), dtype=np.float64)
+            nodes = self.roots
+            for _ in range(self.max_depth):
+                nodes = nodes[self.left[nodes] != nodes]  # Leaves point to themselves
+                for children in (self.left[nodes], self.right[nodes]):
+                    paths[children] = paths[nodes]
+                    paths[children, self.feature[nodes]] += self.leaf_value[children] - self.leaf_value[nodes]
+                nodes = np.concatenate([self.left[nodes], self.right[nodes]])
+            self._path_contributions = paths
+        return self._path_contributions
+
+    def contributions(self, X: np.ndarray):
+        paths = self.path_contributions()
+        contributions = np.zeros((X.shape[0], X.shape[1]), dtype=np.float64)
+        contributions[:, :paths.shape[1]] = paths[self.leaves(X)].mean(axis=1)
+        return float(self.leaf_value[self.roots].mean()), contributions
+
+
+class SklearnModel:
+    """Fallback for estimators without a compiled kernel."""
+
+    kind = "sklearn"
+    explanation_scale = None  # No contributions for arbitrary estimators
+
+    def __init__(self, clf: Any, feature_columns):
+        self.clf = clf
+        self.feature_columns = list(feature_columns)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        import pandas as pd
+
+        df_pred = pd.DataFrame(X, columns=self.feature_columns, copy=False)
+        return self.clf.predict_proba(df_pred)[:, 1]
+
+
+class LookupTableModel:
+    """
+    P(risk) precomputed for every integer age in [age_min, age_max] and every
+    combination of the nine binary flags.
+
+    Expects Age in column 0 and the flags in columns 1-9 (MODEL_FEATURE_COLUMNS
+    order). The table has shape (n_ages, 512) and is indexed by
+    [age - age_min, bitmask], where flag column i sets bit i - 1. Rows with a
+    non-integer or out-of-range age, or a flag other than 0/1, are scored by
+    the fallback engine.
+    """
+
+    kind = "lookup"
+    n_flags = 9
+
+    def __init__(self, table: np.ndarray, age_min: int, fallback: Any):
+        self.table = np.ascontiguousarray(table, dtype=np.float64)
+        self.age_min = int(age_min)
+        self.fallback = fallback
+        self._bit_weights = 1 << np.arange(self.n_flags)
+
+    @property
+    def explanation_scale(self):
+        return self.fallback.explanation_scale
+
+    def contributions(self, X: np.ndarray):
+        """Explained by the compiled engine the table was built from."""
+        return self.fallback.contributions(X)
+
+    @classmethod
+    def grid(cls, age_min: int = LOOKUP_AGE_MIN, age_max: int = LOOKUP_AGE_MAX) -> np.ndarray:
+        """Returns every table cell as a feature matrix, in table order."""
+        ages = np.arange(age_min, age_max + 1, dtype=np.float64)
+        masks = np.arange(1 << cls.n_flags)
+        flags = (masks[:, None] >> np.arange(cls.n_flags)) & 1
+        X = np.empty((len(ages), len(masks), 1 + cls.n_flags), dtype=np.float64)
+        X[:, :, 0] = ages[:, None]
+        X[:, :, 1:] = flags[None, :, :]
+        return X.reshape(-1, 1 + cls.n_flags)
+
+    @classmethod
+    def build(cls, engine: Any, age_min: int = LOOKUP_AGE_MIN, age_max: int = LOOKUP_AGE_MAX) -> "LookupTableModel":
+        table = engine.predict_proba(cls.grid(age_min, age_max))
+        return cls(table.reshape(age_max - age_min + 1, 1 << cls.n_flags), age_min, engine)
+
+    @classmethod
+    def load(cls, path: str, fallback: Any) -> "LookupTableModel":
+        with np.load(path) as data:
+            return cls(data["table"], int(data["age_min"]), fallback)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, table=self.table, age_min=self.age_min)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        age_idx = X[:, 0] - self.age_min
+        flags = X[:, 1:]
+        in_table = (
+            (age_idx == np.floor(age_idx))
+            & (age_idx >= 0)
+            & (age_idx < self.table.shape[0])
+            & np.all((flags == 0) | (flags == 1), axis=1)
+        )
+        if in_table.all():
+            masks = flags.astype(np.intp) @ self._bit_weights
+            return self.table[age_idx.astype(np.intp), masks]
+
+        proba = np.empty(X.shape[0], dtype=np.float64)
+        hits = np.flatnonzero(in_table)
+        if hits.size:
+            masks = flags[hits].astype(np.intp) @ self._bit_weights
+            proba[hits] = self.table[age_idx[hits].astype(np.intp), masks]
+        misses = np.flatnonzero(~in_table)
+        proba[misses] = self.fallback.predict_proba(X[misses])
+        return proba
+
+
+def compile_model(clf: Any, feature_columns):
+    """
+    Builds the fastest available inference engine for a fitted estimator.
+    Like the service, engines report column 1 of predict_proba.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    is_binary = len(getattr(clf, "classes_", ())) == 2
+    if isinstance(clf, LogisticRegression) and is_binary:
+        return LinearModel(clf.coef_[0], clf.intercept_[0])
+    if isinstance(clf, RandomForestClassifier) and is_binary and clf.n_outputs_ == 1:
+        return ForestModel.from_estimators(clf.estimators_)
+    return SklearnModel(clf, feature_columns)
+
+
+def verify_compiled(engine: Any, clf: Any, feature_columns, n_samples: int = 2048, seed: int = 0) -> float:
+    """
+    Compares engine.predict_proba against clf.predict_proba on synthetic
+    inputs (random 0/1 flags, ages 18-100) and raises ValueError if they
+    differ by more than PROBA_TOLERANCE. Returns the max absolute difference.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, size=(n_samples, len(feature_columns))).astype(np.float64)
+    X[:, list(feature_columns).index("Age")] = rng.uniform(18, 100, size=n_samples).round(1)
+
+    expected = clf.predict_proba(pd.DataFrame(X, columns=list(feature_columns)))[:, 1]
+    max_diff = float(np.max(np.abs(engine.predict_proba(X) - expected)))
+    if max_diff > PROBA_TOLERANCE:
+        raise ValueError(f"Compiled {engine.kind} model differs from predict_proba by {max_diff:.3g}")
+    return max_diff
+
+
+def verify_contributions(engine: Any, X: np.ndarray) -> float:
+    """
+    Checks that engine.contributions(X) adds back up to the prediction on the
+    engine's explanation scale and raises ValueError if it does not. Returns
+    the max absolute difference.
+    """
+    base_value, contributions = engine.contributions(X)
+    proba = engine.predict_proba(X)
+    expected = np.log(proba / (1.0 - proba)) if engine.explanation_scale == "log_odds" else proba
+    max_diff = float(np.max(np.abs(base_value + contributions.sum(axis=1) - expected)))
+    if max_diff > 1e-6:
+        raise ValueError(f"{engine.kind} contributions differ from the prediction by {max_diff:.3g}")
+    return max_diff
+
+
+def verify_lookup(table: LookupTableModel, engine: Any) -> float:
+    """
+    Checks every cell of a lookup table against the live engine and raises
+    ValueError if any differs by more than PROBA_TOLERANCE (e.g. a table saved
+    for an older model). Returns the max absolute difference.
+    """
+    age_max = table.age_min + table.table.shape[0] - 1
+    expected = engine.predict_proba(LookupTableModel.grid(table.age_min, age_max))
+    max_diff = float(np.max(np.abs(table.table.ravel() - expected)))
+    if max_diff > PROBA_TOLERANCE:
+        raise ValueError(f"Lookup table differs from the live model by {max_diff:.3g}")
+    return max_diff
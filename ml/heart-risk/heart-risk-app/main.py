@@ -1,13 +1,31 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 
-from pydantic import BaseModel
-import joblib
-import pandas as pd
+from pydantic import BaseModel, TypeAdapter, ValidationError
+import asyncio
+import csv
+import hashlib
+import hmac
+import io
+import os
+import json
+import time
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, NamedTuple
+
+from artifact import current_version, load_artifact, save_artifact
+from inference import compile_model, verify_compiled, verify_lookup, LookupTableModel, SklearnModel
+from metrics import MetricsMiddleware, metrics_response, operation_timer, register_stats
+from microbatch import MicroBatcher
+from prediction_log import PredictionLog
+from profiling import Profiler, ProfilerMiddleware
+from response_catalog import ExplanationEncoder, ResponseCatalog, encode_json
+from shadow import ShadowEvaluator
+from startup import memory_usage, process_started_at
 
 # --- 1. CONFIGURATION ---
 
@@ -17,9 +35,92 @@ MODEL_FEATURE_COLUMNS = [
     'Smoking', 'Family_History', 'Chronic_Stress',
     'Shortness_of_Breath', 'Pain_Arms_Jaw_Back', 'Cold_Sweats_Nausea'
 ]
+TARGET_COLUMN = 'Heart_Risk'  # Outcome label in the training CSV
+
+# Probability cut-offs between Low/Medium and Medium/High risk
+RISK_THRESHOLDS = [0.20, 0.50]
+RISK_LEVELS = ["Low Risk", "Medium Risk", "High Risk"]
+RISK_ADVICE = {
+    "Low Risk": "Your overall risk profile is low. Great job! Review your personalized tips for maintenance.",
+    "Medium Risk": "Your overall risk profile is medium. This indicates some risk factors should be addressed. We recommend reviewing your tips and scheduling a professional assessment with your doctor.",
+    "High Risk": "Your overall risk profile is high. Please seek immediate medical advice or consult a doctor.",
+}
+
+# Set HEART_RISK_LOOKUP_TABLE=1 to answer integer-age requests from a table of
+# every possible input, precomputed by train_model.py or at startup
+USE_LOOKUP_TABLE = os.getenv("HEART_RISK_LOOKUP_TABLE", "0") == "1"
+LOOKUP_TABLE_FILENAME = "heart_risk_table.npz"
+
+# Rows scored per predict_proba call by the streaming batch endpoint
+BATCH_CHUNK_SIZE = 2048
+
+MODEL_FILENAME = "heart_model.pkl"
+# heart_model.pkl compiled to artifact arrays, one directory per pkl hash, so
+# only the first start after a new pkl needs joblib and scikit-learn
+PKL_CACHE_DIR = os.getenv("HEART_RISK_PKL_CACHE_DIR", ".model_cache")
+
+# Compiled model artifacts published by train_model.py (see artifact.py). The
+# service polls for a new version every HEART_RISK_RELOAD_INTERVAL seconds
+# (0 disables polling); POST /admin/reload with an X-Admin-Token header equal
+# to HEART_RISK_ADMIN_TOKEN reloads on demand.
+ARTIFACT_DIR = os.getenv("HEART_RISK_ARTIFACT_DIR", "model_artifacts")
+RELOAD_INTERVAL_SECONDS = float(os.getenv("HEART_RISK_RELOAD_INTERVAL", "10"))
+ADMIN_TOKEN = os.getenv("HEART_RISK_ADMIN_TOKEN", "")
+
+# Concurrent /predict calls are scored together in micro-batches of up to
+# HEART_RISK_BATCH_MAX_SIZE requests, waiting at most HEART_RISK_BATCH_MAX_WAIT_MS
+# for a batch to fill while under load. A max size of 1 turns batching off.
+BATCH_MAX_SIZE = int(os.getenv("HEART_RISK_BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.getenv("HEART_RISK_BATCH_MAX_WAIT_MS", "2"))
+
+# Per-request profiling (see profiling.py): requests carrying an X-Profile
+# header signed with HEART_RISK_ADMIN_TOKEN, plus this fraction of all requests.
+# Profiles are listed under /admin/profiles.
+PROFILE_SAMPLE_RATE = float(os.getenv("HEART_RISK_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("HEART_RISK_PROFILE_INTERVAL_MS", "2"))
+PROFILE_BUFFER_SIZE = int(os.getenv("HEART_RISK_PROFILE_BUFFER_SIZE", "50"))
+
+# Set HEART_RISK_PREDICTION_LOG_DIR to keep every /predict input and result as
+# gzip CSV segments for retraining (see prediction_log.py). At most
+# HEART_RISK_PREDICTION_LOG_QUEUE rows wait in memory; beyond that rows are
+# dropped and counted rather than slowing requests down.
+PREDICTION_LOG_DIR = os.getenv("HEART_RISK_PREDICTION_LOG_DIR", "")
+PREDICTION_LOG_QUEUE = int(os.getenv("HEART_RISK_PREDICTION_LOG_QUEUE", "10000"))
+PREDICTION_LOG_SEGMENT_ROWS = int(os.getenv("HEART_RISK_PREDICTION_LOG_SEGMENT_ROWS", "100000"))
+PREDICTION_LOG_SEGMENT_SECONDS = float(os.getenv("HEART_RISK_PREDICTION_LOG_SEGMENT_SECONDS", "3600"))
+
+# Set HEART_RISK_SHADOW_DIR to an artifact root (train_model.py --shadow-dir)
+# to score a HEART_RISK_SHADOW_SAMPLE_RATE fraction of /predict rows with a
+# candidate model in the background and compare it with the live one (see
+# shadow.py). HEART_RISK_SHADOW_CPU_BUDGET is the share of one core it may use.
+SHADOW_DIR = os.getenv("HEART_RISK_SHADOW_DIR", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("HEART_RISK_SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_CPU_BUDGET = float(os.getenv("HEART_RISK_SHADOW_CPU_BUDGET", "0.05"))
+SHADOW_QUEUE = int(os.getenv("HEART_RISK_SHADOW_QUEUE", "1000"))
 
 # --- 2. MODEL AND DATA LOADING ---
-app = FastAPI(title="Heart Risk API", description="Provides Heart Risk Prediction and Personalized Tips")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if prediction_log is not None:
+        prediction_log.start()
+    if shadow is not None:
+        shadow.start()
+    if batcher is not None:
+        await batcher.start()
+    watcher = asyncio.create_task(_watch_artifacts()) if RELOAD_INTERVAL_SECONDS > 0 else None
+    # uvicorn accepts connections only once this returns
+    warm_up()
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    if batcher is not None:
+        await batcher.stop()
+    if prediction_log is not None:
+        await run_in_threadpool(prediction_log.close)
+    if shadow is not None:
+        await run_in_threadpool(shadow.close)
+
+app = FastAPI(title="Heart Risk API", description="Provides Heart Risk Prediction and Personalized Tips", lifespan=lifespan)
 
 # Add CORS middleware to allow frontend requests
 app.add_middleware(
@@ -29,13 +130,121 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+profiler = Profiler(ADMIN_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_BUFFER_SIZE)
+# Not installed at all unless profiling is configured
+if profiler.enabled:
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+# Outermost, so it also times CORS preflights and error responses
+app.add_middleware(MetricsMiddleware)
+
+
+class LoadedModel(NamedTuple):
+    engine: Any       # Serving engine with predict_proba(X) -> P(risk)
+    version: str      # Artifact version, or a hash of heart_model.pkl
+    source: str       # "artifact" or "pkl"
+    loaded_at: float
+
+
+def _load_pkl_engine():
+    """
+    Loads heart_model.pkl compiled (see inference.py), from PKL_CACHE_DIR when
+    this pkl has been compiled before.
+    """
+    with open(MODEL_FILENAME, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    version = "pkl-" + digest
+    cache_root = os.path.join(PKL_CACHE_DIR, digest)
+    try:
+        engine, _ = load_artifact(cache_root, MODEL_FEATURE_COLUMNS)
+        return engine, version
+    except (FileNotFoundError, ValueError):
+        pass
+
+    import joblib  # Unpickling imports scikit-learn, SciPy and pandas
+    clf = joblib.load(MODEL_FILENAME)
+    engine = compile_model(clf, MODEL_FEATURE_COLUMNS)
+    try:
+        verify_compiled(engine, clf, MODEL_FEATURE_COLUMNS)
+    except ValueError as e:
+        print(f"WARNING: {e}. Falling back to sklearn predict_proba.")
+        return SklearnModel(clf, MODEL_FEATURE_COLUMNS), version
+    try:
+        save_artifact(engine, cache_root, MODEL_FEATURE_COLUMNS)
+    except (OSError, TypeError) as e:
+        print(f"WARNING: could not cache the compiled model: {e}")
+    return engine, version
+
+
+def load_model() -> LoadedModel:
+    """
+    Builds the serving engine from the live artifact in ARTIFACT_DIR, falling
+    back to heart_model.pkl when no artifact has been published.
+    """
+    try:
+        engine, manifest = load_artifact(ARTIFACT_DIR, MODEL_FEATURE_COLUMNS)
+        version, source = manifest["version"], "artifact"
+    except FileNotFoundError:
+        engine, version = _load_pkl_engine()
+        source = "pkl"
+
+    if USE_LOOKUP_TABLE:
+        try:
+            table = LookupTableModel.load(LOOKUP_TABLE_FILENAME, fallback=engine)
+            verify_lookup(table, engine)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Rebuilding lookup table ({e}).")
+            table = LookupTableModel.build(engine)
+        engine = table
+
+    return LoadedModel(engine, version, source, time.time())
+
+
+def reload_model() -> LoadedModel:
+    """
+    Loads the latest model and swaps it in with a single assignment. Requests
+    already being scored keep the engine they started with.
+    """
+    global model
+    new_model = load_model()
+    model = new_model
+    print(f"Loaded model {new_model.version} from {new_model.source}.")
+    return new_model
+
+
+def reload_shadow() -> None:
+    engine, manifest = load_artifact(SHADOW_DIR, MODEL_FEATURE_COLUMNS)
+    shadow.set_model(engine, manifest["version"])
+    print(f"Loaded shadow model {manifest['version']}.")
+
 
+async def _watch_artifacts():
+    """Polls ARTIFACT_DIR (and SHADOW_DIR) and hot-reloads when a new version is published."""
+    while True:
+        await asyncio.sleep(RELOAD_INTERVAL_SECONDS)
+        if shadow is not None:
+            try:
+                if current_version(SHADOW_DIR) != shadow.version:
+                    await run_in_threadpool(reload_shadow)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARNING: could not load shadow model: {e}")
+        try:
+            version = current_version(ARTIFACT_DIR)
+        except FileNotFoundError:
+            continue
+        if model is None or version != model.version:
+            try:
+                await run_in_threadpool(reload_model)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARNING: could not load artifact {version}: {e}")
 
+
+_load_started = time.perf_counter()
 try:
-    clf = joblib.load("heart_model.pkl")
+    model = load_model()
 except FileNotFoundError:
     print("FATAL ERROR: heart_model.pkl not found. Run train_model.py first.")
-    clf = None
+    model = None
+MODEL_LOAD_SECONDS = time.perf_counter() - _load_started
 
 # --- 3. PYDANTIC MODELS (Data Validation) ---
 class HeartRiskInput(BaseModel):
@@ -150,47 +359,360 @@ def generate_personalized_tips(mapped_inputs: List[float], risk_level: str) -> D
     return tips_output
 
 
+PREDICT_PROBA_TIMER = operation_timer("predict_proba")
+
+
+def score_matrix(engine: Any, X: np.ndarray) -> np.ndarray:
+    """Returns P(risk) for every row of an (n, 10) feature matrix in one call."""
+    with PREDICT_PROBA_TIMER.time():
+        return engine.predict_proba(X)
+
+
+def build_prediction(mapped_inputs: List[float], proba_of_risk: float, risk_level: str) -> Dict[str, Any]:
+    """Assembles the PredictionResponse payload for one scored row."""
+    tips_data = generate_personalized_tips(mapped_inputs, risk_level)
+    return {
+        "risk_level": risk_level,
+        "advice": RISK_ADVICE[risk_level],
+        "probability": proba_of_risk,
+        "urgent_warning": tips_data["urgent_warning"],
+        "personalized_tips": tips_data["personalized_tips"],
+        "general_tips": tips_data["general_tips"]
+    }
+
+
+# Every possible response body, pre-validated and pre-encoded (see response_catalog.py);
+# tests/test_response_catalog.py checks them byte for byte
+catalog = ResponseCatalog.build(build_prediction, PredictionResponse, MODEL_FEATURE_COLUMNS, RISK_LEVELS)
+explanation_encoder = ExplanationEncoder(MODEL_FEATURE_COLUMNS)
+
+
+def render_predictions(current: LoadedModel, X: np.ndarray, log: bool = False, explain: bool = False) -> List[bytes]:
+    """
+    Scores a feature matrix in one model call and renders a JSON body per row.
+    With log=True (the /predict path) the batch also goes to the prediction log
+    and the shadow model. With explain=True every body also carries the
+    per-feature contributions behind its probability (see inference.py).
+
+    CURRENT is the model the caller read once for the whole request, so a
+    concurrent reload cannot mix two models in one response.
+    """
+    probas = score_matrix(current.engine, X)
+    level_idx = np.searchsorted(RISK_THRESHOLDS, probas, side="right")
+    if log and prediction_log is not None:
+        prediction_log.record(X, probas, level_idx, current.version)
+    if log and shadow is not None:
+        shadow.record(X, probas, level_idx, current.version)
+    masks = catalog.flag_masks(X)
+    bodies = [
+        catalog.render(idx, mask, proba)
+        for idx, mask, proba in zip(level_idx.tolist(), masks.tolist(), probas.tolist())
+    ]
+    if explain:
+        engine = current.engine
+        base_value, contributions = engine.contributions(X)
+        explanations = explanation_encoder.render(engine.explanation_scale, base_value, contributions)
+        bodies = [body[:-1] + explanation + b"}" for body, explanation in zip(bodies, explanations)]
+    return bodies
+
+
+def explanations_unavailable(current: LoadedModel) -> JSONResponse | None:
+    """The error response for explain=true when the serving engine cannot explain."""
+    if current.engine.explanation_scale is None:
+        return JSONResponse(status_code=501, content={"error": f"No explanations for the {current.engine.kind} engine"})
+    return None
+
+
+# When the process started and when it first scored a request (see warm_up)
+PROCESS_STARTED_AT = process_started_at()
+first_prediction_at = None
+
+
+def warm_up() -> None:
+    """
+    Scores one input through the full render path so that the first real
+    request doesn't pay for lazy initialisation. serve.py calls this before
+    forking, and the lifespan calls it again in each worker.
+    """
+    global first_prediction_at
+    current = model
+    if current is None:
+        return
+    X = np.zeros((1, len(MODEL_FEATURE_COLUMNS)), dtype=np.float64)
+    X[0, MODEL_FEATURE_COLUMNS.index("Age")] = 50
+    # Also builds the forest's path contributions, so forked workers share them
+    render_predictions(current, X, explain=current.engine.explanation_scale is not None)
+    if first_prediction_at is None:
+        first_prediction_at = time.time()
+
+
+def render_logged_predictions(X: np.ndarray) -> List[bytes]:
+    return render_predictions(model, X, log=True)
+
+
+prediction_log = None
+if PREDICTION_LOG_DIR:
+    prediction_log = PredictionLog(
+        PREDICTION_LOG_DIR, MODEL_FEATURE_COLUMNS, TARGET_COLUMN, RISK_LEVELS,
+        PREDICTION_LOG_QUEUE, PREDICTION_LOG_SEGMENT_ROWS, PREDICTION_LOG_SEGMENT_SECONDS,
+    )
+    register_stats("prediction_log", prediction_log.stats)
+
+shadow = None
+if SHADOW_DIR:
+    try:
+        shadow_engine, shadow_manifest = load_artifact(SHADOW_DIR, MODEL_FEATURE_COLUMNS)
+        shadow = ShadowEvaluator(
+            shadow_engine, shadow_manifest["version"], RISK_THRESHOLDS, RISK_LEVELS,
+            SHADOW_SAMPLE_RATE, SHADOW_CPU_BUDGET, SHADOW_QUEUE,
+        )
+        register_stats("shadow", shadow.stats)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"WARNING: shadow evaluation disabled, could not load {SHADOW_DIR}: {e}")
+
+batcher = MicroBatcher(render_logged_predictions, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS) if BATCH_MAX_SIZE > 1 else None
+if batcher is not None:
+    register_stats("batching", batcher.stats)
+
+
 # --- 5. API PREDICTION ENDPOINT ---
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict_risk(data: HeartRiskInput):
+async def predict_risk(data: HeartRiskInput, explain: bool = False):
     """
     Receives 10 inputs, runs prediction, and returns a JSON response
     with risk level and structured, personalized health tips.
+
+    With ?explain=true the response also has an "explanation": the scale
+    ("log_odds" or "probability"), a base_value and the contribution of each
+    feature, which add up to the prediction on that scale.
     """
-    if clf is None:
+    current = model
+    if current is None:
         return {"error": "Model not loaded"} 
 
-    mapped_inputs = [data.dict()[feature] for feature in MODEL_FEATURE_COLUMNS]
-    df_pred = pd.DataFrame([mapped_inputs], columns=MODEL_FEATURE_COLUMNS)
-    proba_of_risk = clf.predict_proba(df_pred)[0][1]
+    mapped_inputs = [getattr(data, feature) for feature in MODEL_FEATURE_COLUMNS]
+    if explain:
+        unavailable = explanations_unavailable(current)
+        if unavailable is not None:
+            return unavailable
+        # Scored on its own, outside the micro-batches
+        X = np.array([mapped_inputs], dtype=np.float64)
+        body = (await run_in_threadpool(render_predictions, current, X, True, True))[0]
+    elif batcher is not None:
+        body = await batcher.submit(mapped_inputs)
+    else:
+        X = np.array([mapped_inputs], dtype=np.float64)
+        body = (await run_in_threadpool(render_logged_predictions, X))[0]
+
+    # The body comes pre-validated from the catalog, so skip response_model
+    return Response(content=body, media_type="application/json")
 
 
-    
-    if proba_of_risk < 0.20:
-        risk_level = "Low Risk"
-        advice = "Your overall risk profile is low. Great job! Review your personalized tips for maintenance."
-    elif proba_of_risk < 0.50:
-        risk_level = "Medium Risk"
-        advice = "Your overall risk profile is medium. This indicates some risk factors should be addressed. We recommend reviewing your tips and scheduling a professional assessment with your doctor."
-    else:
-        risk_level = "High Risk"
-        advice = "Your overall risk profile is high. Please seek immediate medical advice or consult a doctor."
+# --- 6. BATCH PREDICTION ENDPOINTS ---
 
-    # 5. Generate Personalized Tips based on input profile
-    tips_data = generate_personalized_tips(mapped_inputs, risk_level)
+_input_adapter = TypeAdapter(HeartRiskInput)
+
+
+def _inputs_to_matrix(records: List[HeartRiskInput]) -> np.ndarray:
+    return np.array(
+        [[getattr(record, feature) for feature in MODEL_FEATURE_COLUMNS] for record in records],
+        dtype=np.float64,
+    ).reshape(-1, len(MODEL_FEATURE_COLUMNS))
+
+
+def _parse_record(line: str, header: List[str] | None) -> Any:
+    """Parses one NDJSON line, or one CSV row when a header is given."""
+    if header is not None:
+        return dict(zip(header, next(csv.reader([line]))))
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return line  # Reported as a validation error for this row
 
-    # 6. Return the full structured JSON response
+
+def _score_chunk(current: LoadedModel, rows: List[int], inputs: List[HeartRiskInput], errors: Dict[int, str],
+                 explain: bool = False) -> bytes:
+    """Scores one chunk and renders it as NDJSON, keeping input row order."""
+    lines = {row: encode_json({"row": row, "error": error}) for row, error in errors.items()}
+    if inputs:
+        bodies = render_predictions(current, _inputs_to_matrix(inputs), explain=explain)
+        for row, body in zip(rows, bodies):
+            lines[row] = b'{"row":%d,' % row + body[1:]
+    return b"".join(lines[row] + b"\n" for row in sorted(lines))
+
+
+def _stream_predictions(current: LoadedModel, lines: Iterable[str], is_csv: bool, explain: bool = False) -> Iterator[bytes]:
+    """
+    Validates records line by line and scores them BATCH_CHUNK_SIZE at a time,
+    yielding NDJSON results for each chunk as soon as it has been scored.
+    """
+    header = None
+    row = -1
+    chunk_rows: List[int] = []
+    chunk_inputs: List[HeartRiskInput] = []
+    chunk_errors: Dict[int, str] = {}
+
+    for line in lines:
+        if not line.strip():
+            continue
+        if is_csv and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            continue
+        row += 1
+        try:
+            chunk_inputs.append(_input_adapter.validate_python(_parse_record(line, header)))
+            chunk_rows.append(row)
+        except ValidationError as e:
+            chunk_errors[row] = str(e)
+        if len(chunk_rows) + len(chunk_errors) >= BATCH_CHUNK_SIZE:
+            yield _score_chunk(current, chunk_rows, chunk_inputs, chunk_errors, explain)
+            chunk_rows, chunk_inputs, chunk_errors = [], [], {}
+
+    if chunk_rows or chunk_errors:
+        yield _score_chunk(current, chunk_rows, chunk_inputs, chunk_errors, explain)
+
+
+@app.post("/predict/batch", response_model=List[PredictionResponse])
+def predict_risk_batch(data: List[HeartRiskInput], explain: bool = False):
+    """
+    Scores a JSON array of inputs with a single vectorized model call and
+    returns the predictions in the same order (with ?explain=true, each with
+    its explanation as in /predict).
+    """
+    current = model
+    if current is None:
+        return JSONResponse(status_code=503, content={"error": "Model not loaded"})
+    if explain:
+        unavailable = explanations_unavailable(current)
+        if unavailable is not None:
+            return unavailable
+    bodies = render_predictions(current, _inputs_to_matrix(data), explain=explain) if data else []
+    return Response(content=b"[" + b",".join(bodies) + b"]", media_type="application/json")
+
+
+@app.post("/predict/batch/stream")
+async def predict_risk_batch_stream(request: Request, explain: bool = False):
+    """
+    Scores an NDJSON (application/x-ndjson) or CSV (text/csv) request body and
+    streams NDJSON results back chunk by chunk. Each output line carries the
+    zero-based input "row"; rows that fail validation yield an "error" instead.
+    ?explain=true adds explanations as in /predict.
+    """
+    current = model
+    if current is None:
+        return JSONResponse(status_code=503, content={"error": "Model not loaded"})
+    if explain:
+        unavailable = explanations_unavailable(current)
+        if unavailable is not None:
+            return unavailable
+
+    is_csv = request.headers.get("content-type", "").startswith("text/csv")
+    # The body is buffered before streaming starts; StreamingResponse then
+    # drives the synchronous generator from the threadpool, so validation and
+    # scoring stay off the event loop.
+    body = (await request.body()).decode("utf-8")
+    lines = io.StringIO(body)
+    return StreamingResponse(_stream_predictions(current, lines, is_csv, explain), media_type="application/x-ndjson")
+
+
+@app.get("/model")
+def model_info():
+    """Version and source of the model currently serving predictions."""
+    if model is None:
+        return JSONResponse(status_code=503, content={"error": "Model not loaded"})
     return {
-        "risk_level": risk_level,
-        "advice": advice,
-        "probability": proba_of_risk,
-        "urgent_warning": tips_data["urgent_warning"],
-        "personalized_tips": tips_data["personalized_tips"],
-        "general_tips": tips_data["general_tips"]
+        "version": model.version,
+        "source": model.source,
+        "engine": model.engine.kind,
+        "loaded_at": model.loaded_at,
+    }
+
+
+def require_admin_token(x_admin_token: str) -> None:
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: str = Header("")):
+    """Loads the latest artifact (or heart_model.pkl) and swaps it in."""
+    require_admin_token(x_admin_token)
+    try:
+        await run_in_threadpool(reload_model)
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}")
+    return model_info()
+
+
+@app.get("/admin/profiles")
+def list_profiles(x_admin_token: str = Header("")):
+    """Request profiles in the ring buffer, oldest first."""
+    require_admin_token(x_admin_token)
+    return [profile.summary() for profile in profiler.profiles]
+
+
+@app.get("/admin/profiles/collapsed", response_class=PlainTextResponse)
+def download_profiles(x_admin_token: str = Header("")):
+    """Every buffered profile as collapsed stacks, one flamegraph root per request."""
+    require_admin_token(x_admin_token)
+    return profiler.collapsed()
+
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+def download_profile(profile_id: int, x_admin_token: str = Header("")):
+    require_admin_token(x_admin_token)
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.collapsed()
+
+
+@app.get("/ready")
+def readiness():
+    """Start-up timings and memory of the worker that answers."""
+    if model is None or first_prediction_at is None:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {
+        "ready": True,
+        "pid": os.getpid(),
+        "model_version": model.version,
+        "model_load_seconds": MODEL_LOAD_SECONDS,
+        "time_to_first_prediction_seconds": first_prediction_at - PROCESS_STARTED_AT,
+        "memory": memory_usage(),
     }
 
 
+@app.get("/stats/batching")
+def batching_stats():
+    """Micro-batching queue depth and batch-size histograms for /predict."""
+    if batcher is None:
+        return {"enabled": False}
+    return batcher.stats()
+
+
+@app.get("/stats/prediction-log")
+def prediction_log_stats():
+    """Rows logged, queued and dropped by the prediction log."""
+    if prediction_log is None:
+        return {"enabled": False}
+    return prediction_log.stats()
+
+
+@app.get("/stats/shadow")
+def shadow_stats():
+    """Agreement, risk-level flips and probability deltas of the shadow model against the live one."""
+    if shadow is None:
+        return {"enabled": False}
+    return shadow.stats()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition of request latency, predict_proba timings and batching."""
+    return metrics_response()
+
+
 # ----- Code to serve  Frontend UI -----
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
@@ -0,0 +1,137 @@
+# Generated from shared/metrics.py by shared/vendor.py; edit that file, not this copy.
+"""
+Prometheus instrumentation shared by the backend and the heart-risk service.
+They build separately, so shared/vendor.py copies this file into each one.
+
+- MetricsMiddleware: per-route latency histograms, status counts and an
+  in-flight gauge, labelled by route template so cardinality stays bounded.
+- operation_timer(name): histogram child for timing internal operations
+  (Mongo commands, bcrypt, JWT, predict_proba) with `.time()` or `.observe()`.
+- register_stats(prefix, fn): exposes an existing stats() dict as gauges.
+- metrics_response(): the /metrics body in the text exposition format.
+
+Recording is an in-memory update, so the cost is the same whether or not
+anything scrapes. For several workers (uvicorn --workers N / gunicorn), set
+PROMETHEUS_MULTIPROC_DIR to an empty directory before starting the server:
+every worker then writes to memory-mapped files there and /metrics on any
+worker aggregates all of them. register_stats gauges always describe the
+worker that served the scrape and carry its pid as a label.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Operations are mostly sub-millisecond (predict_proba, JWT) or ~100 ms (bcrypt)
+OPERATION_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_COUNT = Counter(
+    "http_requests_total", "HTTP responses by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.",
+    multiprocess_mode="livesum",
+)
+OPERATION_LATENCY = Histogram(
+    "operation_duration_seconds", "Time spent in instrumented internal operations.",
+    ["operation"], buckets=OPERATION_BUCKETS,
+)
+
+_stats_collectors = []
+
+
+def operation_timer(operation: str):
+    """The OPERATION_LATENCY child for `operation`; resolve once at import time."""
+    return OPERATION_LATENCY.labels(operation)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task or body buffering)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._children = {}
+
+    def _record(self, method: str, route: str, status: int, elapsed: float) -> None:
+        key = (method, route, status)
+        children = self._children.get(key)
+        if children is None:
+            children = (REQUEST_LATENCY.labels(method, route), REQUEST_COUNT.labels(method, route, str(status)))
+            self._children[key] = children
+        children[0].observe(elapsed)
+        children[1].inc()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        root_path = scope.get("root_path", "")
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            # The router leaves the matched route in the scope; mounts only
+            # extend root_path
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                mount = scope.get("root_path", "")
+                route = mount + "/{path}" if mount != root_path else "<unmatched>"
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            self._record(method, route, status, elapsed)
+
+
+class StatsCollector:
+    """Collects a component's stats() dict as gauges named <prefix>_<key>."""
+
+    def __init__(self, prefix: str, stats):
+        self.prefix = prefix
+        self.stats = stats
+
+    def collect(self):
+        pid = str(os.getpid())
+        for key, value in self.stats().items():
+            if isinstance(value, (bool, int, float)):
+                gauge = GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.prefix} {key} (this worker).", labels=["pid"])
+                gauge.add_metric([pid], float(value))
+                yield gauge
+
+
+def register_stats(prefix: str, stats) -> None:
+    collector = StatsCollector(prefix, stats)
+    _stats_collectors.append(collector)
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        REGISTRY.register(collector)
+
+
+def metrics_response() -> Response:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _stats_collectors:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,157 @@
+"""
+Adaptive micro-batching for concurrent /predict requests.
+
+Requests submit their feature row to an asyncio queue and await a future.
+A single collector task takes up to max_batch_size queued rows, scores them
+with one call in a dedicated executor thread and resolves each future with
+its own result. While a batch is being scored new requests pile up in the
+queue, so batches grow with load on their own. The collector only waits up
+to max_wait_ms for a batch to fill when the previous batch had more than one
+request, so an idle service adds no latency.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+# Upper bounds of the batch-size and queue-depth histogram buckets
+HISTOGRAM_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+
+class Histogram:
+    """Non-cumulative bucket counts, plus an overflow bucket at the end."""
+
+    def __init__(self, buckets: List[int] = HISTOGRAM_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value: int) -> None:
+        index = int(np.searchsorted(self.buckets, value, side="left"))
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+        }
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        score_batch: Callable[[np.ndarray], List[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+    ):
+        self.score_batch = score_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.batch_sizes = Histogram()
+        self.queue_depths = Histogram()
+        self.batches = 0
+        self.requests = 0
+        self.busy_seconds = 0.0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._last_batch_size = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        if self._executor is not None:
+            # Left over from a collector whose event loop has gone away
+            self._executor.shutdown(wait=False)
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="heart-risk-batch")
+        self._task = asyncio.create_task(self._run(), name="heart-risk-microbatcher")
+
+    async def stop(self) -> None:
+        """Scores everything already queued, then stops the collector."""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        self._task = None
+
+    async def submit(self, row: List[float]) -> Any:
+        """Queues one feature row and waits for its scored result."""
+        if not self.running:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[float], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        self.queue_depths.observe(self._queue.qsize() + 1)
+        deadline = time.monotonic() + self.max_wait
+        wait_for_more = self._last_batch_size > 1 and self.max_wait > 0
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if not wait_for_more or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            X = np.array([row for row, _ in batch], dtype=np.float64)
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self.score_batch, X)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+                self.batches += 1
+                self.requests += len(batch)
+                self.batch_sizes.observe(len(batch))
+                self._last_batch_size = len(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "busy_seconds": self.busy_seconds,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_depth_at_collect": self.queue_depths.snapshot(),
+        }
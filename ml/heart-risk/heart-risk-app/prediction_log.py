@@ -0,0 +1,190 @@
+"""
+Append-only log of /predict traffic, kept as training data for train_model.py.
+
+record() is called from the scoring path with a whole scored micro-batch. It
+only appends references to an in-memory queue under a lock, so it never waits
+on disk. The queue is bounded in rows: when it is full the batch is dropped
+and counted instead of slowing requests down.
+
+A background thread takes what is queued every FLUSH_INTERVAL_SECONDS (or as
+soon as WRITE_BATCH_ROWS are waiting). It writes the rows as CSV to the
+current segment, appending one complete gzip member per write, so a crash
+loses at most the rows still queued. The segment being written is named
+*.csv.gz.part. It is renamed to *.csv.gz once it reaches segment_rows rows
+or segment_seconds of age, and on close(). Leftover .part files from a crash
+are finished the same way at startup (unless the worker that wrote them is
+still running).
+
+Segments are plain gzip CSV with the training columns first:
+
+    Age,Gender,...,Cold_Sweats_Nausea,Heart_Risk,probability,risk_level,model_version,logged_at
+
+Heart_Risk is the outcome label and is left empty: production traffic has no
+ground truth. train_model.py --data DIR reads the segments and skips rows
+that are still unlabelled.
+"""
+import csv
+import glob
+import gzip
+import io
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+SEGMENT_SUFFIX = ".csv.gz"
+PART_SUFFIX = ".part"
+FLUSH_INTERVAL_SECONDS = 1.0
+WRITE_BATCH_ROWS = 1000
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def segment_paths(directory: str) -> list:
+    """Finished segments in DIRECTORY, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, "*" + SEGMENT_SUFFIX)))
+
+
+class PredictionLog:
+    def __init__(self, directory: str, feature_columns, target_column: str, risk_levels,
+                 max_queue_rows: int = 10_000, segment_rows: int = 100_000, segment_seconds: float = 3600.0):
+        self.directory = directory
+        self.header = list(feature_columns) + [target_column, "probability", "risk_level", "model_version", "logged_at"]
+        self.risk_levels = list(risk_levels)
+        self.max_queue_rows = max_queue_rows
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+
+        self._queue = deque()
+        self._queued_rows = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._segment = None
+        self._segment_rows = 0
+        self._segment_started = 0.0
+
+        self.logged = 0
+        self.dropped = 0
+        self.segments = 0
+        self.write_errors = 0
+
+        os.makedirs(directory, exist_ok=True)
+        for part in glob.glob(os.path.join(directory, "predictions-*" + SEGMENT_SUFFIX + PART_SUFFIX)):
+            # predictions-<time>-<pid>-<n>: leave segments of other live workers alone
+            pid = os.path.basename(part).split("-")[2]
+            if not pid.isdigit() or not _pid_alive(int(pid)) or int(pid) == os.getpid():
+                os.replace(part, part[:-len(PART_SUFFIX)])
+        self._thread = None
+
+    def start(self) -> None:
+        """Starts the writer thread; called from the lifespan, so after any fork."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+            self._thread.start()
+
+    def record(self, X: np.ndarray, probas: np.ndarray, level_idx: np.ndarray, model_version: str) -> None:
+        """Queues one scored batch; never blocks on I/O. The arrays must not be modified afterwards."""
+        n = len(probas)
+        with self._cond:
+            if self._closing or self._queued_rows + n > self.max_queue_rows:
+                self.dropped += n
+                return
+            self._queue.append((X, probas, level_idx, model_version, time.time()))
+            self._queued_rows += n
+            if self._queued_rows >= WRITE_BATCH_ROWS:
+                self._cond.notify()
+
+    def _take(self) -> list:
+        with self._cond:
+            if not self._closing and self._queued_rows < WRITE_BATCH_ROWS:
+                self._cond.wait(FLUSH_INTERVAL_SECONDS)
+            batches = list(self._queue)
+            self._queue.clear()
+            self._queued_rows = 0
+            return batches
+
+    def _encode(self, batches: list) -> bytes:
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        if self._segment_rows == 0:
+            writer.writerow(self.header)
+        for X, probas, level_idx, version, logged_at in batches:
+            stamp = datetime.fromtimestamp(logged_at, timezone.utc).isoformat()
+            for features, proba, idx in zip(X.tolist(), probas.tolist(), level_idx.tolist()):
+                values = [int(v) if v.is_integer() else v for v in features]
+                writer.writerow([*values, "", proba, self.risk_levels[idx], version, stamp])
+        return out.getvalue().encode("utf-8")
+
+    def _write(self, batches: list) -> None:
+        rows = sum(len(batch[1]) for batch in batches)
+        if self._segment is None:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+            self._segment = os.path.join(self.directory, f"predictions-{stamp}-{os.getpid()}-{self.segments}{SEGMENT_SUFFIX}")
+            self._segment_rows = 0
+            self._segment_started = time.monotonic()
+        try:
+            with open(self._segment + PART_SUFFIX, "ab") as fh:
+                fh.write(gzip.compress(self._encode(batches)))
+        except OSError as e:
+            self.write_errors += 1
+            self.dropped += rows
+            print(f"WARNING: could not write prediction log: {e}")
+            return
+        self._segment_rows += rows
+        self.logged += rows
+        if (self._segment_rows >= self.segment_rows
+                or time.monotonic() - self._segment_started >= self.segment_seconds):
+            self._rotate()
+
+    def _rotate(self) -> None:
+        if self._segment is None:
+            return
+        try:
+            os.replace(self._segment + PART_SUFFIX, self._segment)
+        except OSError as e:
+            self.write_errors += 1
+            print(f"WARNING: could not finish prediction log segment: {e}")
+        self._segment = None
+        self.segments += 1
+
+    def _run(self) -> None:
+        while True:
+            batches = self._take()
+            if batches:
+                self._write(batches)
+            elif self._segment is not None and time.monotonic() - self._segment_started >= self.segment_seconds:
+                self._rotate()
+            if self._closing and not self._queue:
+                self._rotate()
+                return
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Writes everything queued and finishes the current segment."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = self._queued_rows
+        return {
+            "queued_rows": queued,
+            "max_queue_rows": self.max_queue_rows,
+            "logged_rows": self.logged,
+            "dropped_rows": self.dropped,
+            "segments": self.segments,
+            "write_errors": self.write_errors,
+        }
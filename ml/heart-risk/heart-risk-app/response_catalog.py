@@ -0,0 +1,148 @@
+"""
+Pre-serialized /predict response bodies.
+
+generate_personalized_tips() only looks at whether each of the eight
+risk-factor and symptom flags equals 1, and at the risk level. Apart from the
+probability, every response body is therefore one of 3 x 256 possibilities.
+ResponseCatalog validates and JSON-encodes each of them once at startup and
+keeps the bytes on either side of the probability value, so serving a
+prediction is a bytes join instead of Pydantic validation plus json.dumps.
+"""
+import json
+import numpy as np
+from typing import Any, Callable, Dict, List, Sequence
+
+# Flags read by generate_personalized_tips; flag i sets bit i of the mask
+TIP_FLAG_COLUMNS = [
+    'High_BP', 'High_Cholesterol', 'Smoking', 'Family_History',
+    'Chronic_Stress', 'Shortness_of_Breath', 'Pain_Arms_Jaw_Back', 'Cold_Sweats_Nausea'
+]
+
+
+def encode_json(content: Any) -> bytes:
+    """Encodes content exactly as Starlette's JSONResponse does."""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def encode_probability(proba: float) -> bytes:
+    return float.__repr__(float(proba)).encode("ascii")
+
+
+class ExplanationEncoder:
+    """
+    Encodes rows of a contributions matrix as the ',"explanation":{...}'
+    member that explain mode inserts before the closing brace of a body. The
+    feature keys (and the scale and base value of each model) are encoded
+    once, so a row costs one float repr per feature.
+    """
+
+    def __init__(self, feature_columns: Sequence[str]):
+        self.keys = [encode_json(column) + b":" for column in feature_columns]
+        self._heads: Dict[tuple, bytes] = {}
+
+    def render(self, scale: str, base_value: float, contributions: np.ndarray) -> List[bytes]:
+        head = self._heads.get((scale, base_value))
+        if head is None:
+            if len(self._heads) > 16:  # Stale models after reloads
+                self._heads.clear()
+            head = self._heads[scale, base_value] = (
+                b',"explanation":{"scale":' + encode_json(scale)
+                + b',"base_value":' + encode_probability(base_value) + b',"contributions":{'
+            )
+        keys = self.keys
+        return [
+            head + b",".join([key + float.__repr__(value).encode("ascii") for key, value in zip(keys, row)]) + b"}}"
+            for row in contributions.tolist()
+        ]
+
+
+class ResponseCatalog:
+    """
+    Response bodies keyed by [risk level index, tip flag bitmask], stored as
+    (prefix, suffix) byte pairs that surround the encoded probability.
+    """
+
+    n_masks = 1 << len(TIP_FLAG_COLUMNS)
+
+    def __init__(self, prefixes: List[bytes], suffixes: List[bytes], flag_indices: Sequence[int]):
+        self.prefixes = prefixes
+        self.suffixes = suffixes
+        self.flag_indices = list(flag_indices)
+        self._bit_weights = 1 << np.arange(len(self.flag_indices))
+
+    @classmethod
+    def build(
+        cls,
+        build_prediction: Callable[[List[float], float, str], Dict[str, Any]],
+        response_model: Any,
+        feature_columns: Sequence[str],
+        risk_levels: Sequence[str],
+    ) -> "ResponseCatalog":
+        """
+        Renders every (risk level, bitmask) body through build_prediction and
+        response_model, the same path /predict used to take per request.
+        """
+        flag_indices = [list(feature_columns).index(column) for column in TIP_FLAG_COLUMNS]
+        prefixes, suffixes = [], []
+        for risk_level in risk_levels:
+            for mask in range(cls.n_masks):
+                payload = build_prediction(cls.inputs_for_mask(mask, feature_columns, flag_indices), 0.0, risk_level)
+                items = list(response_model.model_validate(payload).model_dump(mode="json").items())
+                split = [key for key, _ in items].index("probability")
+                prefixes.append(encode_json(dict(items[:split]))[:-1] + b',"probability":')
+                suffixes.append(b"," + encode_json(dict(items[split + 1:]))[1:])
+        return cls(prefixes, suffixes, flag_indices)
+
+    @staticmethod
+    def inputs_for_mask(mask: int, feature_columns: Sequence[str], flag_indices: Sequence[int]) -> List[float]:
+        mapped_inputs = [0] * len(feature_columns)
+        for bit, index in enumerate(flag_indices):
+            mapped_inputs[index] = (mask >> bit) & 1
+        return mapped_inputs
+
+    def flag_masks(self, X: np.ndarray) -> np.ndarray:
+        """Returns the tip flag bitmask of every row of a feature matrix."""
+        return (X[:, self.flag_indices] == 1).astype(np.intp) @ self._bit_weights
+
+    def render(self, level_index: int, mask: int, proba: float) -> bytes:
+        key = level_index * self.n_masks + mask
+        return self.prefixes[key] + encode_probability(proba) + self.suffixes[key]
+
+
+def verify_catalog(
+    catalog: ResponseCatalog,
+    build_prediction: Callable[[List[float], float, str], Dict[str, Any]],
+    response_model: Any,
+    feature_columns: Sequence[str],
+    risk_levels: Sequence[str],
+    probabilities: Sequence[float] = (0.0, 0.123456789012345, 0.5, 0.9999999999999999),
+) -> int:
+    """
+    Renders every catalog key at several probabilities and raises ValueError
+    unless each body is byte-for-byte identical to validating the
+    build_prediction payload with response_model and encoding it like
+    JSONResponse. Inputs use both 0/1 flags and other integers (which the tips
+    treat as "not 1"). Returns the number of bodies checked.
+    """
+    checked = 0
+    for level_index, risk_level in enumerate(risk_levels):
+        for mask in range(catalog.n_masks):
+            mapped_inputs = ResponseCatalog.inputs_for_mask(mask, feature_columns, catalog.flag_indices)
+            # Any value other than 1 must land on the same key as 0
+            mapped_inputs = [2 if value == 0 else value for value in mapped_inputs]
+            X = np.array([mapped_inputs], dtype=np.float64)
+            actual_mask = int(catalog.flag_masks(X)[0])
+            for proba in probabilities:
+                payload = build_prediction(mapped_inputs, proba, risk_level)
+                expected = encode_json(response_model.model_validate(payload).model_dump(mode="json"))
+                actual = catalog.render(level_index, actual_mask, proba)
+                if actual != expected:
+                    raise ValueError(f"Catalog body for {risk_level!r}, mask {mask:#010b} does not match: {actual!r}")
+                checked += 1
+    return checked
@@ -0,0 +1,198 @@
+"""
+Prefork server for the heart-risk service.
+
+    python serve.py --workers 4 --port 8001
+
+`uvicorn main:app --workers N` starts N fresh interpreters, and each of them
+imports the app, loads the model and builds the response catalog on its own.
+This master does that once, runs a warm-up prediction, freezes the garbage
+collector and then forks the workers:
+
+- the model arrays, the response catalog and the imported modules are shared
+  copy-on-write by every worker instead of being rebuilt per worker
+  (gc.freeze() stops collections from touching, and so copying, those pages);
+- a worker is serving milliseconds after it is forked, which is what makes
+  restarts and scale-ups fast;
+- the listening socket is opened by the master and inherited.
+
+Once every worker has finished its lifespan start-up, the master prints the
+time to first prediction and each worker's RSS, PSS and shared memory; each
+worker reports its own figures at GET /ready. Workers that die are replaced.
+A worker that exits within CRASH_WINDOW_SECONDS of being forked (a bad
+artifact, a port clash) counts as a crash: each consecutive crash doubles
+the wait before the next fork, and after MAX_CONSECUTIVE_CRASHES the master
+stops and exits with status 1 so the supervisor sees the failure. SIGTERM or
+SIGINT stops every worker gracefully.
+
+Use PROMETHEUS_MULTIPROC_DIR with more than one worker (see metrics.py).
+"""
+import argparse
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from startup import memory_usage, process_started_at
+
+READY_TIMEOUT_SECONDS = 60
+# Workers that exit sooner than this after being forked count as crashes
+CRASH_WINDOW_SECONDS = 10
+MAX_CONSECUTIVE_CRASHES = 5
+RESTART_BACKOFF_SECONDS = 0.5
+RESTART_BACKOFF_MAX_SECONDS = 30
+
+
+def _format_memory(memory: dict) -> str:
+    return "  ".join(f"{key[:-6]} {value / 2**20:6.1f} MB" for key, value in memory.items())
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, ready_fd: int, args) -> None:
+    """Runs in the forked child; never returns."""
+    import asyncio
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    server = uvicorn.Server(config)
+
+    async def serve():
+        task = asyncio.ensure_future(server.serve(sockets=[sock]))
+        while not server.started and not task.done():
+            await asyncio.sleep(0.005)
+        if server.started:
+            os.write(ready_fd, b"%d\n" % os.getpid())
+        await task
+
+    status = 0
+    try:
+        asyncio.run(serve())
+    except BaseException:
+        status = 1
+    os._exit(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the heart-risk API from preforked workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HEART_RISK_WORKERS", "1")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--keep-alive", type=int, default=5, help="Seconds to keep idle connections open")
+    args = parser.parse_args()
+
+    started_at = process_started_at()
+    import main as service  # Loads the model and builds the response catalog
+    if service.model is None:
+        sys.exit(1)
+    service.warm_up()
+    print(f"Master {os.getpid()}: model {service.model.version} loaded in {service.MODEL_LOAD_SECONDS:.2f}s, "
+          f"first prediction {service.first_prediction_at - started_at:.2f}s after start")
+
+    sock = _bind(args.host, args.port)
+    ready_read, ready_write = os.pipe()
+    workers = {}
+    restarts = []  # When each replacement worker is due to be forked
+    crashes = 0
+    exit_status = 0
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            _run_worker(service.app, sock, ready_write, args)
+        workers[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        restarts.clear()
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Everything allocated so far stays out of the workers' collections
+    gc.collect()
+    gc.freeze()
+    for _ in range(args.workers):
+        spawn()
+
+    pending = set(workers)
+    deadline = time.time() + READY_TIMEOUT_SECONDS
+    buffered = b""
+    while workers or restarts:
+        timeout = 0.5 if not restarts else min(0.5, max(0.0, min(restarts) - time.time()))
+        readable, _, _ = select.select([ready_read], [], [], timeout)
+        if readable:
+            buffered += os.read(ready_read, 4096)
+            *lines, buffered = buffered.split(b"\n")
+            for line in lines:
+                pid = int(line)
+                if pid in pending:
+                    pending.discard(pid)
+                    if not pending:
+                        print(f"Ready: {len(workers)} workers on {args.host}:{args.port}, first prediction "
+                              f"{service.first_prediction_at - started_at:.2f}s and all workers up "
+                              f"{time.time() - started_at:.2f}s after start")
+                        print(f"  master {os.getpid()}: {_format_memory(memory_usage())}")
+                        for worker in workers:
+                            print(f"  worker {worker}: {_format_memory(memory_usage(worker))}")
+                else:
+                    print(f"Worker {pid} ready in {time.time() - workers.get(pid, time.time()):.2f}s")
+        if pending and time.time() > deadline:
+            print(f"WARNING: workers {sorted(pending)} not ready after {READY_TIMEOUT_SECONDS}s")
+            pending.clear()
+
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            forked_at = workers.pop(pid, None)
+            pending.discard(pid)
+            if stopping or forked_at is None:
+                continue
+            crashes = crashes + 1 if time.time() - forked_at < CRASH_WINDOW_SECONDS else 0
+            if crashes >= MAX_CONSECUTIVE_CRASHES:
+                print(f"ERROR: {crashes} workers in a row exited within {CRASH_WINDOW_SECONDS}s of starting; "
+                      f"stopping")
+                exit_status = 1
+                stop(signal.SIGTERM, None)
+                continue
+            delay = min(RESTART_BACKOFF_MAX_SECONDS, RESTART_BACKOFF_SECONDS * 2 ** (crashes - 1)) if crashes else 0
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; "
+                  f"restarting in {delay:.1f}s")
+            restarts.append(time.time() + delay)
+
+        now = time.time()
+        due = [at for at in restarts if at <= now]
+        for at in due:
+            restarts.remove(at)
+            spawn()
+    sock.close()
+    sys.exit(exit_status)
+
+
+if __name__ == "__main__":
+    main()
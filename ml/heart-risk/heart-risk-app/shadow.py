@@ -0,0 +1,251 @@
+"""
+Shadow evaluation of a candidate model against live /predict traffic.
+
+The candidate is a second compiled artifact (see artifact.py). It never
+answers a request. record() is called from the scoring path with each scored
+micro-batch and keeps a random sample_rate fraction of its rows. It only
+appends them to an in-memory queue, so it adds nothing but the sampling to
+the request. A background thread scores the queued rows with the candidate
+after the responses have gone out. It then folds the comparison into
+streaming aggregates:
+
+- agreement rate: same risk level from both models;
+- risk-level flips, counted per (primary level -> shadow level) pair and
+  split into flips up and down;
+- P(risk) deltas (shadow minus primary): mean, standard deviation, mean
+  absolute delta, min/max, and a histogram of absolute deltas.
+
+Shadow scoring is held to cpu_budget: the fraction of one core it may use,
+measured with the thread's own CPU clock. The budget is a token bucket of
+CPU seconds. Every wall-clock second deposits cpu_budget seconds, up to
+BUDGET_WINDOW_SECONDS worth, and every scored chunk withdraws the CPU time it
+took. When the balance is spent, sampled rows are skipped and counted instead
+of being queued. The queue is also bounded in rows. Rows are scored at most
+EVAL_CHUNK_ROWS at a time, so the thread never holds the interpreter for long.
+
+The aggregates start over whenever the primary or the candidate model
+changes, so they always describe one pair of versions.
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+import numpy as np
+
+EVAL_CHUNK_ROWS = 256
+BUDGET_WINDOW_SECONDS = 1.0
+# Upper bounds of the |shadow - primary| probability histogram buckets
+DELTA_BUCKETS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5]
+
+
+class ComparisonStats:
+    """Streaming agreement, flip and probability-delta aggregates."""
+
+    def __init__(self, risk_levels: List[str]):
+        self.risk_levels = list(risk_levels)
+        n_levels = len(self.risk_levels)
+        self.compared = 0
+        self.agreements = 0
+        self.transitions = np.zeros((n_levels, n_levels), dtype=np.int64)
+        self.delta_mean = 0.0
+        self.delta_m2 = 0.0
+        self.abs_delta_total = 0.0
+        self.delta_min = 0.0
+        self.delta_max = 0.0
+        self.abs_delta_counts = np.zeros(len(DELTA_BUCKETS) + 1, dtype=np.int64)
+
+    def update(self, primary_level: np.ndarray, shadow_level: np.ndarray, delta: np.ndarray) -> None:
+        n = len(delta)
+        if n == 0:
+            return
+        n_levels = len(self.risk_levels)
+        pairs = primary_level * n_levels + shadow_level
+        self.transitions += np.bincount(pairs, minlength=n_levels * n_levels).reshape(n_levels, n_levels)
+        self.agreements += int(np.count_nonzero(primary_level == shadow_level))
+
+        # Chan et al. merge of the batch mean/M2 into the running ones
+        batch_mean = float(delta.mean())
+        batch_m2 = float(((delta - batch_mean) ** 2).sum())
+        total = self.compared + n
+        diff = batch_mean - self.delta_mean
+        self.delta_m2 += batch_m2 + diff * diff * self.compared * n / total
+        self.delta_mean += diff * n / total
+        self.delta_min = min(self.delta_min, float(delta.min())) if self.compared else float(delta.min())
+        self.delta_max = max(self.delta_max, float(delta.max())) if self.compared else float(delta.max())
+        abs_delta = np.abs(delta)
+        self.abs_delta_total += float(abs_delta.sum())
+        self.abs_delta_counts += np.bincount(
+            np.searchsorted(DELTA_BUCKETS, abs_delta, side="left"), minlength=len(DELTA_BUCKETS) + 1
+        )
+        self.compared = total
+
+    def snapshot(self) -> Dict[str, Any]:
+        n = self.compared
+        flips = {
+            f"{self.risk_levels[i]} -> {self.risk_levels[j]}": int(self.transitions[i, j])
+            for i in range(len(self.risk_levels))
+            for j in range(len(self.risk_levels))
+            if i != j and self.transitions[i, j]
+        }
+        labels = [f"<={bound}" for bound in DELTA_BUCKETS] + [f">{DELTA_BUCKETS[-1]}"]
+        return {
+            "compared_rows": n,
+            "agreement_rate": self.agreements / n if n else None,
+            "flips": flips,
+            "flips_up": int(np.triu(self.transitions, 1).sum()),
+            "flips_down": int(np.tril(self.transitions, -1).sum()),
+            "delta_mean": self.delta_mean if n else None,
+            "delta_std": (self.delta_m2 / n) ** 0.5 if n else None,
+            "abs_delta_mean": self.abs_delta_total / n if n else None,
+            "delta_min": self.delta_min if n else None,
+            "delta_max": self.delta_max if n else None,
+            "abs_delta_buckets": dict(zip(labels, self.abs_delta_counts.tolist())),
+        }
+
+
+class ShadowEvaluator:
+    def __init__(self, engine: Any, version: str, risk_thresholds: List[float], risk_levels: List[str],
+                 sample_rate: float = 0.1, cpu_budget: float = 0.05, max_queue_rows: int = 1000):
+        self.engine = engine
+        self.version = version
+        self.risk_thresholds = list(risk_thresholds)
+        self.risk_levels = list(risk_levels)
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.cpu_budget = max(0.0, cpu_budget)
+        self.max_queue_rows = max_queue_rows
+
+        self._queue = deque()
+        self._queued_rows = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = None
+        self._budget_cap = self.cpu_budget * BUDGET_WINDOW_SECONDS
+        self._budget = self._budget_cap
+        self._budget_at = time.monotonic()
+        self._started_at = time.monotonic()
+
+        self.primary_version = None
+        self.comparison = ComparisonStats(risk_levels)
+        self.sampled = 0
+        self.skipped_budget = 0
+        self.dropped = 0
+        self.errors = 0
+        self.cpu_seconds = 0.0
+
+    def start(self) -> None:
+        """Starts the scoring thread; called from the lifespan, so after any fork."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shadow-eval", daemon=True)
+            self._thread.start()
+
+    def set_model(self, engine: Any, version: str) -> None:
+        """Swaps in a new candidate and starts the aggregates over."""
+        with self._cond:
+            self.engine, self.version = engine, version
+            self._queue.clear()
+            self._queued_rows = 0
+            self.comparison = ComparisonStats(self.risk_levels)
+
+    def record(self, X: np.ndarray, probas: np.ndarray, level_idx: np.ndarray, primary_version: str) -> None:
+        """Queues a sample of one scored batch; never scores on the caller's thread."""
+        rows = [i for i in range(len(probas)) if random.random() < self.sample_rate]
+        if not rows:
+            return
+        n = len(rows)
+        with self._cond:
+            self.sampled += n
+            if self._closing or self._queued_rows + n > self.max_queue_rows:
+                self.dropped += n
+                return
+            now = time.monotonic()
+            self._budget = min(self._budget_cap, self._budget + (now - self._budget_at) * self.cpu_budget)
+            self._budget_at = now
+            if self._budget <= 0:
+                self.skipped_budget += n
+                return
+            self._queue.append((X[rows], probas[rows], level_idx[rows], primary_version))
+            self._queued_rows += n
+            self._cond.notify()
+
+    def _take(self) -> List[tuple]:
+        with self._cond:
+            while not self._queue and not self._closing:
+                self._cond.wait()
+            batches = []
+            rows = 0
+            while self._queue and rows < EVAL_CHUNK_ROWS:
+                batch = self._queue.popleft()
+                batches.append(batch)
+                rows += len(batch[1])
+            self._queued_rows -= rows
+            return batches
+
+    def _evaluate(self, batches: List[tuple]) -> None:
+        started = time.thread_time()
+        with self._cond:
+            engine, version = self.engine, self.version
+        try:
+            X = np.concatenate([batch[0] for batch in batches])
+            primary = np.concatenate([batch[1] for batch in batches])
+            primary_level = np.concatenate([batch[2] for batch in batches])
+            shadow = np.asarray(engine.predict_proba(X), dtype=np.float64)
+            shadow_level = np.searchsorted(self.risk_thresholds, shadow, side="right")
+        except Exception as e:
+            with self._cond:
+                self.errors += 1
+            print(f"WARNING: shadow model {version} failed: {e}")
+            return
+        finally:
+            elapsed = time.thread_time() - started
+            with self._cond:
+                self.cpu_seconds += elapsed
+                self._budget -= elapsed
+
+        primary_version = batches[-1][3]
+        with self._cond:
+            if version != self.version:
+                return  # The candidate was replaced while this chunk was scored
+            if primary_version != self.primary_version:
+                self.primary_version = primary_version
+                self.comparison = ComparisonStats(self.risk_levels)
+            # Batches scored by an earlier primary model are left out
+            keep = np.concatenate([np.full(len(b[1]), b[3] == primary_version) for b in batches])
+            self.comparison.update(primary_level[keep], shadow_level[keep], shadow[keep] - primary[keep])
+
+    def _run(self) -> None:
+        while True:
+            batches = self._take()
+            if batches:
+                self._evaluate(batches)
+            elif self._closing:
+                return
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stops the thread; rows still queued are discarded."""
+        with self._cond:
+            self._closing = True
+            self._queue.clear()
+            self._queued_rows = 0
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            elapsed = time.monotonic() - self._started_at
+            return {
+                "shadow_version": self.version,
+                "primary_version": self.primary_version,
+                "sample_rate": self.sample_rate,
+                "cpu_budget": self.cpu_budget,
+                "cpu_seconds": self.cpu_seconds,
+                "cpu_utilisation": self.cpu_seconds / elapsed if elapsed > 0 else 0.0,
+                "sampled_rows": self.sampled,
+                "queued_rows": self._queued_rows,
+                "skipped_budget_rows": self.skipped_budget,
+                "dropped_rows": self.dropped,
+                "errors": self.errors,
+                **self.comparison.snapshot(),
+            }
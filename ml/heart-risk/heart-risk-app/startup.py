@@ -0,0 +1,47 @@
+"""
+Start-up timing and memory figures for GET /ready and serve.py.
+
+process_started_at() is when the process was created, read from /proc on
+Linux; elsewhere it falls back to when this module was first imported.
+memory_usage() reads /proc/<pid>/smaps_rollup: RSS, PSS (RSS with shared pages
+divided among the processes sharing them) and the shared/private split, which
+shows how much of a forked worker is still shared with the master.
+"""
+import os
+import resource
+import time
+
+_IMPORTED_AT = time.time()
+
+
+def process_started_at(pid: int | str = "self") -> float:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22, counted after the parenthesised command name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return _IMPORTED_AT
+
+
+def memory_usage(pid: int | str = "self") -> dict:
+    """Bytes of rss, pss, shared and private memory (rss only where /proc is unavailable)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        if pid != "self":
+            return {}
+        return {"rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss", 0),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
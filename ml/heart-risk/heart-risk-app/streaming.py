@@ -0,0 +1,149 @@
+"""
+Out-of-core helpers for training and evaluating on CSVs that do not fit in
+memory (train_model.py --stream, evaluate_model.py --stream).
+
+- iter_chunks() reads the CSV in chunks with compact dtypes (int8 flags and
+  target, float32 Age).
+- test_mask() splits rows into train/test by hashing their position in the
+  file: a fixed function of the row number, so the split is the same on
+  every run and never needs the full frame.
+- train_incremental() fits a logistic-loss SGDClassifier with partial_fit and
+  exports it as an equivalent LogisticRegression, so the service,
+  compile_model() and evaluate_model.py treat it like any other model.
+- StreamingBinaryMetrics accumulates accuracy, the confusion matrix and
+  ROC/AUC from fixed-size score histograms.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+CHUNK_SIZE = 100_000
+TEST_FRACTION = 0.2
+# Bins used for the streaming ROC curve. Scores are binned on the logit scale
+# (clipped to +/-ROC_LOGIT_RANGE) so near-0/near-1 probabilities stay separated.
+ROC_BINS = 10_000
+ROC_LOGIT_RANGE = 20.0
+# Age is divided by this before SGD so all features are on a similar scale
+AGE_SCALE = 100.0
+
+
+def csv_dtypes(feature_columns, target_column):
+    dtypes = {column: np.int8 for column in feature_columns}
+    dtypes["Age"] = np.float32
+    dtypes[target_column] = np.int8
+    return dtypes
+
+
+def iter_chunks(path, feature_columns, target_column, chunk_size=CHUNK_SIZE):
+    """Yields (first_row_number, chunk) pairs with compact dtypes."""
+    start = 0
+    reader = pd.read_csv(
+        path,
+        usecols=list(feature_columns) + [target_column],
+        dtype=csv_dtypes(feature_columns, target_column),
+        chunksize=chunk_size,
+    )
+    for chunk in reader:
+        yield start, chunk
+        start += len(chunk)
+
+
+def test_mask(start, n_rows, test_fraction=TEST_FRACTION):
+    """
+    True for rows start..start+n_rows-1 that belong to the test split. The
+    row numbers are hashed with pd.util.hash_array, which mixes numeric input
+    without a key, so the split depends on nothing but the row position.
+    """
+    positions = np.arange(start, start + n_rows, dtype=np.uint64)
+    hashes = pd.util.hash_array(positions)
+    return (hashes % np.uint64(1_000_000)) < np.uint64(int(test_fraction * 1_000_000))
+
+
+def _scaled(X, age_index):
+    X = np.asarray(X, dtype=np.float64).copy()
+    X[:, age_index] /= AGE_SCALE
+    return X
+
+
+def train_incremental(path, feature_columns, target_column, epochs=5, chunk_size=CHUNK_SIZE, seed=42):
+    """
+    Fits a logistic-loss SGDClassifier on the train split, one chunk at a time,
+    for the given number of passes over the file. Returns an equivalent
+    LogisticRegression over the raw (unscaled) features.
+    """
+    age_index = list(feature_columns).index("Age")
+    sgd = SGDClassifier(loss="log_loss", random_state=seed)
+    rng = np.random.default_rng(seed)
+    classes = np.array([0, 1])
+
+    for _ in range(epochs):
+        for start, chunk in iter_chunks(path, feature_columns, target_column, chunk_size):
+            train = chunk[~test_mask(start, len(chunk))]
+            if train.empty:
+                continue
+            order = rng.permutation(len(train))
+            X = _scaled(train[feature_columns].to_numpy()[order], age_index)
+            y = train[target_column].to_numpy()[order]
+            sgd.partial_fit(X, y, classes=classes)
+
+    coef = sgd.coef_.astype(np.float64).copy()
+    coef[0, age_index] /= AGE_SCALE
+    model = LogisticRegression()
+    model.classes_ = classes
+    model.coef_ = coef
+    model.intercept_ = sgd.intercept_.astype(np.float64).copy()
+    model.n_features_in_ = len(feature_columns)
+    model.feature_names_in_ = np.array(feature_columns, dtype=object)
+    model.n_iter_ = np.array([sgd.n_iter_])
+    return model
+
+
+class StreamingBinaryMetrics:
+    """Accuracy, confusion matrix and ROC/AUC with memory bounded by ROC_BINS."""
+
+    def __init__(self, bins=ROC_BINS):
+        self.bins = bins
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.positive_hist = np.zeros(bins, dtype=np.int64)
+        self.negative_hist = np.zeros(bins, dtype=np.int64)
+
+    def update(self, y_true, proba):
+        y_true = np.asarray(y_true, dtype=np.int64)
+        proba = np.asarray(proba, dtype=np.float64)
+        # Same decision rule as predict(): class 1 only when P(1) > 0.5
+        y_pred = (proba > 0.5).astype(np.int64)
+        np.add.at(self.confusion, (y_true, y_pred), 1)
+        with np.errstate(divide="ignore"):
+            logit = np.log(proba) - np.log1p(-proba)
+        scaled = (np.clip(logit, -ROC_LOGIT_RANGE, ROC_LOGIT_RANGE) + ROC_LOGIT_RANGE) / (2 * ROC_LOGIT_RANGE)
+        bin_index = np.minimum((scaled * self.bins).astype(np.int64), self.bins - 1)
+        self.positive_hist += np.bincount(bin_index[y_true == 1], minlength=self.bins)
+        self.negative_hist += np.bincount(bin_index[y_true == 0], minlength=self.bins)
+
+    @property
+    def count(self):
+        return int(self.confusion.sum())
+
+    def accuracy(self):
+        return float(np.trace(self.confusion) / max(self.count, 1))
+
+    def roc_curve(self):
+        """(fpr, tpr) with one point per score bin, from high to low thresholds."""
+        tp = np.concatenate([[0], np.cumsum(self.positive_hist[::-1])])
+        fp = np.concatenate([[0], np.cumsum(self.negative_hist[::-1])])
+        return fp / max(fp[-1], 1), tp / max(tp[-1], 1)
+
+    def auc(self):
+        fpr, tpr = self.roc_curve()
+        return float(np.trapezoid(tpr, fpr))
+
+    def classification_report(self, target_names):
+        lines = [f"{'':>16}{'precision':>10}{'recall':>10}{'f1-score':>10}{'support':>10}"]
+        for label, name in enumerate(target_names):
+            tp = self.confusion[label, label]
+            precision = tp / max(self.confusion[:, label].sum(), 1)
+            recall = tp / max(self.confusion[label, :].sum(), 1)
+            f1 = 2 * precision * recall / max(precision + recall, 1e-12)
+            lines.append(f"{name:>16}{precision:>10.2f}{recall:>10.2f}{f1:>10.2f}{self.confusion[label, :].sum():>10}")
+        lines.append(f"{'accuracy':>16}{'':>20}{self.accuracy():>10.2f}{self.count:>10}")
+        return "\n".join(lines)
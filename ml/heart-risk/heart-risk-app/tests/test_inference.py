@@ -0,0 +1,132 @@
+"""
+Compiled engines against the scikit-learn estimators they are built from.
+
+Fits a small LogisticRegression and RandomForestClassifier on synthetic rows
+shaped like the training data, so no dataset is needed.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from inference import (
+    LOOKUP_AGE_MAX, LOOKUP_AGE_MIN, PROBA_TOLERANCE, ForestModel, LinearModel, LookupTableModel,
+    compile_model, verify_compiled, verify_contributions, verify_lookup
+)
+from main import MODEL_FEATURE_COLUMNS
+
+
+def synthetic_rows(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, size=(n_rows, len(MODEL_FEATURE_COLUMNS))).astype(np.float64)
+    X[:, 0] = rng.integers(18, 100, size=n_rows)
+    logit = 0.04 * (X[:, 0] - 55) + X[:, 2:].sum(axis=1) - 4
+    y = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(int)
+    return pd.DataFrame(X, columns=MODEL_FEATURE_COLUMNS), y
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    X, y = synthetic_rows(2000)
+    return {
+        "linear": LogisticRegression(max_iter=1000).fit(X, y),
+        "forest": RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y),
+    }
+
+
+@pytest.mark.parametrize("kind, engine_class", [("linear", LinearModel), ("forest", ForestModel)])
+def test_compiled_engine_matches_predict_proba(fitted, kind, engine_class):
+    clf = fitted[kind]
+    engine = compile_model(clf, MODEL_FEATURE_COLUMNS)
+    assert isinstance(engine, engine_class)
+
+    X, _ = synthetic_rows(1000, seed=1)
+    X.iloc[::7, 0] += 0.5  # Fractional ages fall between the forest's thresholds
+    expected = clf.predict_proba(X)[:, 1]
+    assert np.max(np.abs(engine.predict_proba(X.to_numpy()) - expected)) <= PROBA_TOLERANCE
+    assert verify_compiled(engine, clf, MODEL_FEATURE_COLUMNS) <= PROBA_TOLERANCE
+
+
+def test_verify_compiled_rejects_a_different_model(fitted):
+    engine = compile_model(fitted["linear"], MODEL_FEATURE_COLUMNS)
+    engine.intercept += 0.01
+    with pytest.raises(ValueError):
+        verify_compiled(engine, fitted["linear"], MODEL_FEATURE_COLUMNS)
+
+
+@pytest.mark.parametrize("kind", ["linear", "forest"])
+def test_lookup_table_matches_the_model_over_the_whole_grid(fitted, kind):
+    clf = fitted[kind]
+    table = LookupTableModel.build(compile_model(clf, MODEL_FEATURE_COLUMNS))
+    assert table.table.shape == (LOOKUP_AGE_MAX - LOOKUP_AGE_MIN + 1, 512)
+
+    grid = LookupTableModel.grid()
+    expected = clf.predict_proba(pd.DataFrame(grid, columns=MODEL_FEATURE_COLUMNS))[:, 1]
+    assert np.max(np.abs(table.predict_proba(grid) - expected)) <= PROBA_TOLERANCE
+    assert verify_lookup(table, table.fallback) <= PROBA_TOLERANCE
+
+
+@pytest.mark.parametrize("kind", ["linear", "forest"])
+def test_lookup_table_edges_fall_back_to_the_model(fitted, kind):
+    clf = fitted[kind]
+    table = LookupTableModel.build(compile_model(clf, MODEL_FEATURE_COLUMNS))
+    # Ages at and just past each end of the table, a fractional age and a non-0/1 flag
+    ages = [LOOKUP_AGE_MIN - 1, LOOKUP_AGE_MIN, LOOKUP_AGE_MAX, LOOKUP_AGE_MAX + 1, 150, 54.5, 60]
+    X = np.ones((len(ages), len(MODEL_FEATURE_COLUMNS)))
+    X[:, 0] = ages
+    X[-1, 3] = 2
+    expected = clf.predict_proba(pd.DataFrame(X, columns=MODEL_FEATURE_COLUMNS))[:, 1]
+    assert np.max(np.abs(table.predict_proba(X) - expected)) <= PROBA_TOLERANCE
+
+    # Only the in-range rows are read from the table
+    table.table[:] = -1.0
+    proba = table.predict_proba(X)
+    assert (proba == -1.0).tolist() == [False, True, True, False, False, False, False]
+
+
+def test_verify_lookup_rejects_a_stale_table(fitted):
+    table = LookupTableModel.build(compile_model(fitted["linear"], MODEL_FEATURE_COLUMNS))
+    table.table[LOOKUP_AGE_MAX - LOOKUP_AGE_MIN, 511] += 1e-6
+    with pytest.raises(ValueError):
+        verify_lookup(table, table.fallback)
+
+
+def test_linear_contributions_add_up_to_the_logit(fitted):
+    clf = fitted["linear"]
+    engine = compile_model(clf, MODEL_FEATURE_COLUMNS)
+    X, _ = synthetic_rows(500, seed=2)
+    base_value, contributions = engine.contributions(X.to_numpy())
+    assert contributions.shape == X.shape
+    assert np.allclose(base_value + contributions.sum(axis=1), clf.decision_function(X), rtol=0, atol=1e-9)
+    assert verify_contributions(engine, X.to_numpy()) <= 1e-6
+
+
+def test_forest_contributions_add_up_to_the_probability(fitted):
+    clf = fitted["forest"]
+    engine = compile_model(clf, MODEL_FEATURE_COLUMNS)
+    X, _ = synthetic_rows(500, seed=3)
+    base_value, contributions = engine.contributions(X.to_numpy())
+    assert np.allclose(base_value + contributions.sum(axis=1), clf.predict_proba(X)[:, 1], rtol=0, atol=1e-9)
+
+    # Saabas: each split's change in P(risk) is credited to its feature, averaged over trees
+    x = X.to_numpy()[0]
+    expected = np.zeros(len(MODEL_FEATURE_COLUMNS))
+    for estimator in clf.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, 0, 1] / tree.value[:, 0, :].sum(axis=1)
+        node = 0
+        while tree.children_left[node] != -1:
+            left = np.float32(x[tree.feature[node]]) <= tree.threshold[node]
+            child = tree.children_left[node] if left else tree.children_right[node]
+            expected[tree.feature[node]] += value[child] - value[node]
+            node = child
+    assert np.allclose(contributions[0], expected / len(clf.estimators_), rtol=0, atol=1e-12)
+
+
+def test_lookup_table_is_explained_by_its_engine(fitted):
+    engine = compile_model(fitted["forest"], MODEL_FEATURE_COLUMNS)
+    table = LookupTableModel.build(engine)
+    X, _ = synthetic_rows(200, seed=4)
+    assert table.explanation_scale == engine.explanation_scale == "probability"
+    assert verify_contributions(table, X.to_numpy()) <= 1e-6
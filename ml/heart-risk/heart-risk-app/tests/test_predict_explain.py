@@ -0,0 +1,53 @@
+"""
+?explain=true on the prediction endpoints, served by the model in
+heart_model.pkl.
+"""
+import json
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import main
+from inference import SklearnModel
+
+RECORD = dict(zip(main.MODEL_FEATURE_COLUMNS, [63.0, 1, 1, 1, 0, 1, 0, 1, 0, 0]))
+
+
+def explained_value(explanation):
+    return explanation["base_value"] + sum(explanation["contributions"].values())
+
+
+def test_predict_explain_adds_an_explanation_to_the_body():
+    with TestClient(main.app) as client:
+        plain = client.post("/predict", json=RECORD).json()
+        explained = client.post("/predict?explain=true", json=RECORD).json()
+
+    explanation = explained.pop("explanation")
+    assert explained == plain
+    assert list(explanation["contributions"]) == main.MODEL_FEATURE_COLUMNS
+    proba = plain["probability"]
+    expected = np.log(proba / (1 - proba)) if explanation["scale"] == "log_odds" else proba
+    assert abs(explained_value(explanation) - expected) < 1e-6
+
+
+def test_batch_endpoints_explain_every_row():
+    with TestClient(main.app) as client:
+        batch = client.post("/predict/batch?explain=true", json=[RECORD, RECORD]).json()
+        plain = client.post("/predict/batch", json=[RECORD]).json()
+        lines = client.post(
+            "/predict/batch/stream?explain=true",
+            content="\n".join(json.dumps(RECORD) for _ in range(3)),
+            headers={"content-type": "application/x-ndjson"},
+        ).text.splitlines()
+
+    assert len(batch) == 2 and all("explanation" in row for row in batch)
+    assert "explanation" not in plain[0]
+    assert len(lines) == 3 and all("explanation" in json.loads(line) for line in lines)
+
+
+def test_explain_is_refused_when_the_engine_cannot_explain(monkeypatch):
+    with TestClient(main.app) as client:
+        # Swapped in after start-up, which scores a warm-up row
+        monkeypatch.setattr(main, "model", main.model._replace(engine=SklearnModel(None, main.MODEL_FEATURE_COLUMNS)))
+        assert client.post("/predict?explain=true", json=RECORD).status_code == 501
+        assert client.post("/predict/batch?explain=true", json=[RECORD]).status_code == 501
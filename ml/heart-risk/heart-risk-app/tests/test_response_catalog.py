@@ -0,0 +1,32 @@
+"""
+Run from the app directory with `python -m pytest tests`.
+
+Importing main loads heart_model.pkl and builds the response catalog, as
+serving does.
+"""
+import numpy as np
+import pytest
+
+import main
+from response_catalog import ResponseCatalog, verify_catalog
+
+
+def test_catalog_matches_validated_responses():
+    checked = verify_catalog(main.catalog, main.build_prediction, main.PredictionResponse,
+                             main.MODEL_FEATURE_COLUMNS, main.RISK_LEVELS)
+    assert checked == len(main.RISK_LEVELS) * ResponseCatalog.n_masks * 4
+
+
+def test_catalog_mismatch_is_reported():
+    catalog = ResponseCatalog(list(main.catalog.prefixes), list(main.catalog.suffixes), main.catalog.flag_indices)
+    catalog.suffixes[1] = catalog.suffixes[1].replace(b'"general_tips"', b'"generic_tips"')
+    with pytest.raises(ValueError):
+        verify_catalog(catalog, main.build_prediction, main.PredictionResponse,
+                       main.MODEL_FEATURE_COLUMNS, main.RISK_LEVELS)
+
+
+def test_flag_masks_treat_only_1_as_set():
+    X = np.zeros((3, len(main.MODEL_FEATURE_COLUMNS)))
+    X[1, main.catalog.flag_indices[0]] = 1
+    X[2, main.catalog.flag_indices] = 2
+    assert main.catalog.flag_masks(X).tolist() == [0, 1, 0]
@@ -1,12 +1,26 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score
+import sklearn
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score
 import joblib
 import numpy as np
 
-# Define the 10 Features 
+from artifact import save_artifact
+from inference import compile_model, LookupTableModel, SklearnModel
+from prediction_log import segment_paths
+from streaming import CHUNK_SIZE, StreamingBinaryMetrics, iter_chunks, test_mask, train_incremental
+
+# Define the 10 Features
 FEATURE_COLUMNS = [
     'Age', 'Gender', 'High_BP', 'High_Cholesterol',
     'Smoking', 'Family_History', 'Chronic_Stress',
@@ -14,61 +28,318 @@ FEATURE_COLUMNS = [
 ]
 TARGET_COLUMN = 'Heart_Risk'
 
-# Load and Prepare Data 
-try:
-    df = pd.read_csv('heart_risk.csv')
-except FileNotFoundError:
-    print("Error: 'heart_risk.csv' not found. Please ensure the file is in the project directory.")
-    exit()
-
-try:
-    X = df[FEATURE_COLUMNS]
-    y = df[TARGET_COLUMN]
-except KeyError as e:
-    print(f"Error: One of the required columns is missing from the CSV: {e}")
-    exit()
-
-# Split into training+validation (80%) and final test set (20%)
-X_train_val, X_test, y_train_val, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-
-# Initialize Models and Perform Cross-Validation
-rf = RandomForestClassifier(random_state=42)
-lr = LogisticRegression(max_iter=1000, random_state=42)
-
-# Perform 5-fold cross-validation on the training+validation set
-print("--- Starting 5-Fold Cross-Validation ---")
-cv_scores_rf = cross_val_score(rf, X_train_val, y_train_val, cv=5)
-cv_scores_lr = cross_val_score(lr, X_train_val, y_train_val, cv=5)
-
-rf_cv_mean = cv_scores_rf.mean()
-lr_cv_mean = cv_scores_lr.mean()
-
-print(f"Random Forest CV Accuracy: {rf_cv_mean:.4f} ± {cv_scores_rf.std():.4f}")
-print(f"Logistic Regression CV Accuracy: {lr_cv_mean:.4f} ± {cv_scores_lr.std():.4f}")
-
-# Select and Finalize the Best Model 
-if rf_cv_mean > lr_cv_mean:
-    best_model = rf
-    best_model_name = "Random Forest"
-    best_model_acc = rf_cv_mean
-else:
-    best_model = lr
-    best_model_name = "Logistic Regression"
-    best_model_acc = lr_cv_mean
-
-# Retrain the best model on the ENTIRE training+validation set
-best_model.fit(X_train_val, y_train_val)
-
-# Evaluate the final chosen model on the unseen test set
-final_test_acc = accuracy_score(y_test, best_model.predict(X_test))
-
-# Save the Best Model and Report 
+DATA_FILENAME = "heart_risk.csv"
 MODEL_FILENAME = "heart_model.pkl"
-joblib.dump(best_model, MODEL_FILENAME)
+REPORT_FILENAME = "heart_model_report.json"
+LOOKUP_TABLE_FILENAME = "heart_risk_table.npz"
+ARTIFACT_DIR = "model_artifacts"
+CV_CACHE_DIR = ".cv_cache"
+CV_FOLDS = 5
+
+# Model families and their fixed constructor arguments. On equal CV accuracy
+# the earlier family/parameter set wins.
+MODEL_FAMILIES = {
+    "Logistic Regression": (LogisticRegression, {"max_iter": 1000, "random_state": 42}),
+    "Random Forest": (RandomForestClassifier, {"random_state": 42}),
+}
+
+# Hyperparameters searched per family (override with --grid grid.json)
+DEFAULT_PARAM_GRID = {
+    "Logistic Regression": {"C": [1.0, 0.1, 10.0]},
+    "Random Forest": {"n_estimators": [100, 300], "max_depth": [None, 8], "min_samples_leaf": [1, 5]},
+}
+
+
+def expand_grid(param_grid):
+    """Yields (family, params) for every combination in the grid."""
+    for family, grid in param_grid.items():
+        if family not in MODEL_FAMILIES:
+            raise ValueError(f"Unknown model family in grid: {family!r}")
+        names = list(grid)
+        for values in product(*(grid[name] for name in names)):
+            yield family, dict(zip(names, values))
+
+
+def build_model(family, params):
+    model_class, fixed_params = MODEL_FAMILIES[family]
+    return model_class(**fixed_params, **params)
+
+
+def dataset_hash(X, y):
+    """Content hash of the training data, used in every CV cache key."""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def fold_cache_key(data_hash, family, params, fold):
+    key = json.dumps(
+        {"data": data_hash, "family": family, "params": params, "fold": fold,
+         "folds": CV_FOLDS, "sklearn": sklearn.__version__},
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+# --- Process pool workers (the data is shipped once per worker) ---
+_worker_X = None
+_worker_y = None
+
+
+def _init_worker(X, y):
+    global _worker_X, _worker_y
+    _worker_X, _worker_y = X, y
+
+
+def _run_fold(family, params, train_idx, val_idx):
+    started = time.perf_counter()
+    model = build_model(family, params)
+    model.fit(_worker_X.iloc[train_idx], _worker_y.iloc[train_idx])
+    score = accuracy_score(_worker_y.iloc[val_idx], model.predict(_worker_X.iloc[val_idx]))
+    return {"score": float(score), "seconds": time.perf_counter() - started}
+
+
+def cross_validate_candidates(X, y, param_grid, jobs, use_cache=True):
+    """
+    Scores every candidate on the same stratified folds (as cross_val_score
+    with cv=5 does), running all uncached (candidate, fold) fits in parallel.
+    """
+    candidates = list(expand_grid(param_grid))
+    folds = list(StratifiedKFold(n_splits=CV_FOLDS).split(X, y))
+    data_hash = dataset_hash(X, y)
+    os.makedirs(CV_CACHE_DIR, exist_ok=True)
+
+    results = {}
+    pending = []
+    for c, (family, params) in enumerate(candidates):
+        for f, (train_idx, val_idx) in enumerate(folds):
+            cache_path = os.path.join(CV_CACHE_DIR, fold_cache_key(data_hash, family, params, f) + ".json")
+            if use_cache and os.path.exists(cache_path):
+                with open(cache_path) as fh:
+                    results[c, f] = {**json.load(fh), "cached": True}
+            else:
+                pending.append((c, f, cache_path))
+
+    print(f"--- Starting {CV_FOLDS}-Fold Cross-Validation: {len(candidates)} candidates, "
+          f"{len(pending)} fits to run, {len(results)} cached ---")
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(X, y)) as pool:
+            futures = {
+                (c, f, cache_path): pool.submit(_run_fold, *candidates[c], *folds[f])
+                for c, f, cache_path in pending
+            }
+            for (c, f, cache_path), future in futures.items():
+                result = future.result()
+                with open(cache_path, "w") as fh:
+                    json.dump(result, fh)
+                results[c, f] = {**result, "cached": False}
+
+    report = []
+    for c, (family, params) in enumerate(candidates):
+        fold_results = [results[c, f] for f in range(CV_FOLDS)]
+        scores = np.array([r["score"] for r in fold_results])
+        report.append({
+            "family": family,
+            "params": params,
+            "fold_scores": scores.tolist(),
+            "cv_mean": float(scores.mean()),
+            "cv_std": float(scores.std()),
+            "fit_seconds": sum(r["seconds"] for r in fold_results),
+            "cached_folds": sum(r["cached"] for r in fold_results),
+        })
+    return report
+
+
+def save_outputs(best_model, best_model_name, final_test_acc, report):
+    """Saves the model, lookup table, artifact and JSON report."""
+    joblib.dump(best_model, MODEL_FILENAME)
+
+    # Precompute P(risk) for every discrete input (used when the service runs
+    # with HEART_RISK_LOOKUP_TABLE=1)
+    compiled_model = compile_model(best_model, FEATURE_COLUMNS)
+    LookupTableModel.build(compiled_model).save(LOOKUP_TABLE_FILENAME)
+
+    # Publish the compiled model as a memory-mapped artifact; running services
+    # pick up the new version without a restart
+    artifact_version = None
+    if not isinstance(compiled_model, SklearnModel):
+        artifact_version = save_artifact(compiled_model, ARTIFACT_DIR, FEATURE_COLUMNS)
+
+    report["selected"]["test_accuracy"] = float(final_test_acc)
+    report["selected"]["artifact_version"] = artifact_version
+    with open(REPORT_FILENAME, "w") as fh:
+        json.dump(report, fh, indent=2)
+
+    print("\n--- Final Model Selection and Evaluation ---")
+    print(f"Best Model Selected: {best_model_name} {report['selected']['params']}")
+    print(f"Final Model Test Accuracy (on 20% unseen data): {final_test_acc:.4f}")
+    print(f"✅ Saved final model ({best_model_name}) to {MODEL_FILENAME}.")
+    print(f"✅ Saved risk lookup table to {LOOKUP_TABLE_FILENAME}.")
+    if artifact_version:
+        print(f"✅ Published model artifact {artifact_version} to {ARTIFACT_DIR}/.")
+    print(f"✅ Saved training report to {REPORT_FILENAME}.")
+
+
+def publish_shadow(candidates, best, X, y, root):
+    """
+    Refits the best candidate of another model family and publishes it to ROOT,
+    for the service to compare against live traffic (HEART_RISK_SHADOW_DIR).
+    """
+    others = [candidate for candidate in candidates if candidate["family"] != best["family"]]
+    if not others:
+        print("No other model family to publish as a shadow candidate.")
+        return None
+    runner_up = max(others, key=lambda candidate: candidate["cv_mean"])
+    model = build_model(runner_up["family"], runner_up["params"])
+    model.fit(X, y)
+    compiled_model = compile_model(model, FEATURE_COLUMNS)
+    if isinstance(compiled_model, SklearnModel):
+        print(f"Cannot publish {runner_up['family']} as an artifact; no shadow candidate published.")
+        return None
+    version = save_artifact(compiled_model, root, FEATURE_COLUMNS)
+    print(f"✅ Published shadow candidate {runner_up['family']} {runner_up['params']} "
+          f"(CV {runner_up['cv_mean']:.4f}) as {version} to {root}/.")
+    return {"family": runner_up["family"], "params": runner_up["params"],
+            "cv_mean": runner_up["cv_mean"], "artifact_version": version}
+
+
+def load_training_frame(paths):
+    """
+    Reads and concatenates CSVs (plain or .csv.gz) and directories of
+    prediction log segments, keeping only rows with a Heart_Risk label.
+    """
+    files = []
+    for path in paths:
+        files.extend(segment_paths(path) if os.path.isdir(path) else [path])
+    if not files:
+        raise FileNotFoundError(", ".join(paths))
+    df = pd.concat([pd.read_csv(path) for path in files], ignore_index=True)
+    if TARGET_COLUMN in df and df[TARGET_COLUMN].isna().any():
+        unlabelled = int(df[TARGET_COLUMN].isna().sum())
+        df = df.dropna(subset=[TARGET_COLUMN])
+        df[TARGET_COLUMN] = df[TARGET_COLUMN].astype(int)
+        print(f"Skipped {unlabelled} rows without a {TARGET_COLUMN} label.")
+    return df
+
+
+def train_streaming(path, epochs, chunk_size):
+    """
+    Out-of-core training: partial_fit over CSV chunks on a hash-based
+    train/test split, then a streaming pass to score the test rows.
+    """
+    print(f"--- Streaming training: {epochs} epochs over {path} in chunks of {chunk_size} ---")
+    started = time.perf_counter()
+    try:
+        model = train_incremental(path, FEATURE_COLUMNS, TARGET_COLUMN, epochs, chunk_size)
+    except FileNotFoundError:
+        print(f"Error: '{path}' not found. Please ensure the file is in the project directory.")
+        exit()
+    except ValueError as e:
+        print(f"Error: One of the required columns is missing from the CSV: {e}")
+        exit()
+    train_seconds = time.perf_counter() - started
+
+    metrics = StreamingBinaryMetrics()
+    for start, chunk in iter_chunks(path, FEATURE_COLUMNS, TARGET_COLUMN, chunk_size):
+        test = chunk[test_mask(start, len(chunk))]
+        if not test.empty:
+            metrics.update(test[TARGET_COLUMN], model.predict_proba(test[FEATURE_COLUMNS])[:, 1])
+
+    params = {"epochs": epochs, "chunk_size": chunk_size}
+    save_outputs(model, "Logistic Regression (streaming SGD)", metrics.accuracy(), {
+        "mode": "streaming",
+        "train_seconds": train_seconds,
+        "test_rows": metrics.count,
+        "selected": {"family": "Logistic Regression (streaming SGD)", "params": params},
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and select the heart risk model.")
+    parser.add_argument("--grid", help="JSON file mapping model family to {param: [values]}")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes for CV")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every CV fold")
+    parser.add_argument("--stream", action="store_true", help="Train out-of-core with partial_fit (for large CSVs)")
+    parser.add_argument("--epochs", type=int, default=5, help="Passes over the CSV in --stream mode")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per chunk in --stream mode")
+    parser.add_argument("--data", nargs="+", default=[DATA_FILENAME],
+                        help="Training CSVs (.csv or .csv.gz) and/or prediction log directories; "
+                             "rows without a Heart_Risk label are skipped")
+    parser.add_argument("--shadow-dir",
+                        help="Also publish the best model of the other family to this artifact root, "
+                             "for shadow evaluation (HEART_RISK_SHADOW_DIR)")
+    args = parser.parse_args()
+
+    if args.stream:
+        if len(args.data) != 1 or os.path.isdir(args.data[0]):
+            parser.error("--stream reads a single labelled CSV")
+        train_streaming(args.data[0], args.epochs, args.chunk_size)
+        return
+
+    param_grid = DEFAULT_PARAM_GRID
+    if args.grid:
+        with open(args.grid) as fh:
+            param_grid = json.load(fh)
+
+    # Load and Prepare Data
+    try:
+        df = load_training_frame(args.data)
+    except FileNotFoundError as e:
+        print(f"Error: training data not found ({e}). Please ensure the file is in the project directory.")
+        exit()
+
+    try:
+        X = df[FEATURE_COLUMNS]
+        y = df[TARGET_COLUMN]
+    except KeyError as e:
+        print(f"Error: One of the required columns is missing from the CSV: {e}")
+        exit()
+
+    # Split into training+validation (80%) and final test set (20%)
+    X_train_val, X_test, y_train_val, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    started = time.perf_counter()
+    candidates = cross_validate_candidates(X_train_val, y_train_val, param_grid, args.jobs, not args.no_cache)
+    cv_seconds = time.perf_counter() - started
+
+    for candidate in candidates:
+        print(f"{candidate['family']} {candidate['params']} CV Accuracy: "
+              f"{candidate['cv_mean']:.4f} ± {candidate['cv_std']:.4f}")
+
+    # Select and Finalize the Best Model (first candidate wins ties)
+    best = max(candidates, key=lambda candidate: candidate["cv_mean"])
+    best_model_name = best["family"]
+    best_model = build_model(best["family"], best["params"])
+
+    # Retrain the best model on the ENTIRE training+validation set
+    started = time.perf_counter()
+    best_model.fit(X_train_val, y_train_val)
+    refit_seconds = time.perf_counter() - started
+
+    # Evaluate the final chosen model on the unseen test set
+    final_test_acc = accuracy_score(y_test, best_model.predict(X_test))
+
+    shadow = publish_shadow(candidates, best, X_train_val, y_train_val, args.shadow_dir) if args.shadow_dir else None
+
+    save_outputs(best_model, best_model_name, final_test_acc, {
+        "mode": "in-memory",
+        "dataset_sha256": dataset_hash(X_train_val, y_train_val),
+        "cv_folds": CV_FOLDS,
+        "cv_seconds": cv_seconds,
+        "jobs": args.jobs,
+        "candidates": candidates,
+        "selected": {
+            "family": best["family"],
+            "params": best["params"],
+            "cv_mean": best["cv_mean"],
+            "refit_seconds": refit_seconds,
+        },
+        "shadow": shadow,
+    })
+
 
-print("\n--- Final Model Selection and Evaluation ---")
-print(f"Best Model Selected (based on CV): {best_model_name}")
-print(f"Final Model Test Accuracy (on 20% unseen data): {final_test_acc:.4f}")
-print(f"✅ Saved final model ({best_model_name}) to {MODEL_FILENAME}.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
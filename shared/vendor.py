@@ -0,0 +1,58 @@
+"""
+Copies the modules shared by the backend and the heart-risk service into
+each service.
+
+The services build from separate Docker contexts (backend/ and
+ml/heart-risk/heart-risk-app/), so neither can import the other's files.
+The shared modules live in this directory; each service gets a generated
+copy whose first line says where it came from. Edit the file here, then:
+
+    python shared/vendor.py           # rewrite the copies
+    python shared/vendor.py --check   # exit 1 if a copy is out of date
+"""
+import argparse
+import sys
+from pathlib import Path
+
+SHARED_DIR = Path(__file__).resolve().parent
+ROOT = SHARED_DIR.parent
+# Shared module -> the copy each service imports
+MODULES = {
+    "metrics.py": ["backend/src/metrics.py", "ml/heart-risk/heart-risk-app/metrics.py"],
+    "profiling.py": ["backend/src/profiling.py", "ml/heart-risk/heart-risk-app/profiling.py"],
+}
+HEADER = "# Generated from shared/{name} by shared/vendor.py; edit that file, not this copy.\n"
+
+
+def vendored(name: str) -> str:
+    return HEADER.format(name=name) + (SHARED_DIR / name).read_text()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the shared modules into the backend and heart-risk service.")
+    parser.add_argument("--check", action="store_true", help="Only report copies that are out of date")
+    args = parser.parse_args()
+
+    stale = []
+    for name, targets in MODULES.items():
+        content = vendored(name)
+        for target in targets:
+            path = ROOT / target
+            if path.exists() and path.read_text() == content:
+                continue
+            stale.append(target)
+            if not args.check:
+                path.write_text(content)
+
+    if args.check:
+        if stale:
+            print(f"Out of date: {', '.join(stale)} (run python shared/vendor.py)")
+            sys.exit(1)
+        print("All shared modules are up to date.")
+        return
+    for target in stale:
+        print(f"Updated {target}")
+
+
+if __name__ == "__main__":
+    main()